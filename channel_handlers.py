@@ -8,10 +8,11 @@ Handles incoming messages from different channels:
 """
 
 import os
+import base64
 import hashlib
 import hmac
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Mapping, Optional, Tuple
 
 from chatbot_engine import generate_response, get_greeting_message
 from conversation_logger import log_conversation
@@ -110,31 +111,35 @@ class TwilioWhatsAppHandler:
         self.account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
         self.auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
         self.whatsapp_number = os.environ.get("TWILIO_WHATSAPP_NUMBER")
+        # Keyed once; each validation works on a copy instead of re-deriving the key
+        self._signature_hmac = (
+            hmac.new(self.auth_token.encode(), digestmod=hashlib.sha1)
+            if self.auth_token else None
+        )
     
     def is_configured(self) -> bool:
         """Check if Twilio is properly configured."""
         return all([self.account_sid, self.auth_token, self.whatsapp_number])
     
-    def validate_request(self, signature: str, url: str, params: dict) -> bool:
-        """Validate incoming Twilio webhook request."""
-        if not self.auth_token:
-            return False
+    def validate_request(self, signature: str, url: str, params: Mapping[str, str]) -> bool:
+        """Validate incoming Twilio webhook request.
         
-        sorted_params = "".join(f"{k}{params[k]}" for k in sorted(params.keys()))
-        data = url + sorted_params
+        params can be the request's form MultiDict as-is; only the first
+        value of each key is signed, matching Twilio's canonicalization.
+        """
+        if self._signature_hmac is None:
+            return False
         
-        expected_sig = hmac.new(
-            self.auth_token.encode(),
-            data.encode(),
-            hashlib.sha1
-        ).digest()
+        mac = self._signature_hmac.copy()
+        mac.update(url.encode())
+        for key, value in sorted(params.items()):
+            mac.update(f"{key}{value}".encode())
         
-        import base64
-        expected_b64 = base64.b64encode(expected_sig).decode()
+        expected_b64 = base64.b64encode(mac.digest())
         
-        return hmac.compare_digest(signature, expected_b64)
+        return hmac.compare_digest(signature.encode(), expected_b64)
     
-    def parse_incoming_message(self, data: dict) -> Tuple[str, str, Optional[str]]:
+    def parse_incoming_message(self, data: Mapping[str, str]) -> Tuple[str, str, Optional[str]]:
         """Parse incoming WhatsApp message from Twilio webhook."""
         from_number = data.get("From", "").replace("whatsapp:", "")
         message = data.get("Body", "")
@@ -165,7 +170,7 @@ class TwilioWhatsAppHandler:
             print(f"Error sending WhatsApp message: {e}")
             return False
     
-    def handle_webhook(self, data: dict) -> str:
+    def handle_webhook(self, data: Mapping[str, str]) -> str:
         """Process incoming WhatsApp webhook and return TwiML response."""
         user_id, message, user_name = self.parse_incoming_message(data)
         
@@ -19,7 +19,8 @@ from database import (
     init_database, get_db_session, is_database_available,
     ChatSession, Conversation, ResponseFeedback, AnalyticsDaily
 )
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, text
+from sqlalchemy.exc import IntegrityError
 
 LOG_DIR = Path("logs")
 CONVERSATION_LOG_FILE = LOG_DIR / "conversations.json"
@@ -78,11 +79,17 @@ def log_conversation(
     safety_category: str = None,
     sources: List[str] = None,
     response_time_ms: int = None,
-    channel: str = "web"
+    channel: str = "web",
+    user_id: int = None,
+    session_channel: str = None
 ) -> dict:
     """
     Log a single conversation exchange.
     
+    The chat session row is created (or touched) in the same transaction as
+    the conversation insert, under a savepoint so that losing a race to
+    create the session does not roll back the conversation row.
+    
     Args:
         session_id: Unique identifier for the chat session
         user_question: The user's question
@@ -92,6 +99,8 @@ def log_conversation(
         sources: List of sources used for the response
         response_time_ms: Response generation time in milliseconds
         channel: Channel (web, instagram, whatsapp)
+        user_id: Optional user account to link the session to
+        session_channel: Channel for a newly created session, if it differs from channel
     
     Returns:
         The logged entry dict with conversation_id
@@ -122,7 +131,11 @@ def log_conversation(
         try:
             with get_db_session() as db:
                 if db is not None:
-                    ensure_session_exists(session_id, channel)
+                    try:
+                        with db.begin_nested():
+                            ensure_session_exists(session_id, session_channel or channel, user_id=user_id)
+                    except IntegrityError:
+                        pass  # a concurrent request created the session first
                     
                     conv = Conversation(
                         session_id=session_id,
@@ -343,6 +356,108 @@ def get_conversation_stats() -> dict:
     }
 
 
+DASHBOARD_STATS_SQL = text("""
+    WITH recent AS (
+        SELECT timestamp, user_question
+        FROM conversations
+        WHERE timestamp >= :cutoff
+    ),
+    daily AS (
+        SELECT date(timestamp) AS day, count(*) AS conversations
+        FROM recent
+        GROUP BY 1
+    ),
+    channels AS (
+        SELECT coalesce(channel, 'web') AS channel, count(*) AS sessions
+        FROM chat_sessions
+        GROUP BY 1
+    ),
+    top_queries AS (
+        SELECT min(user_question) AS query, count(*) AS asked
+        FROM recent
+        GROUP BY lower(trim(user_question))
+        ORDER BY asked DESC
+        LIMIT 10
+    )
+    SELECT
+        (SELECT count(*) FROM conversations) AS total_conversations,
+        (SELECT count(DISTINCT session_id) FROM conversations) AS unique_sessions,
+        (SELECT avg(response_time_ms) FROM conversations WHERE response_time_ms IS NOT NULL) AS avg_response_time_ms,
+        (SELECT count(*) FROM response_feedback WHERE rating > 0) AS positive_feedback,
+        (SELECT count(*) FROM response_feedback WHERE rating < 0) AS negative_feedback,
+        (SELECT coalesce(json_agg(json_build_object('date', day, 'count', conversations) ORDER BY day), '[]')
+            FROM daily) AS conversations_by_day,
+        (SELECT coalesce(json_agg(json_build_object('channel', channel, 'count', sessions)), '[]')
+            FROM channels) AS channel_distribution,
+        (SELECT coalesce(json_agg(json_build_object('query', query, 'count', asked) ORDER BY asked DESC), '[]')
+            FROM top_queries) AS top_queries
+""")
+
+
+def get_dashboard_stats(days: int = 7) -> Dict[str, Any]:
+    """Get every admin dashboard aggregate in a single database round-trip.
+    
+    Totals and channel distribution cover all time; daily counts and top
+    queries cover the last `days` days. DASHBOARD_STATS_SQL is PostgreSQL
+    only, so other databases (and a failed query) fall back to the
+    per-metric helpers, which also cover the file-based logs.
+    """
+    if is_database_available():
+        try:
+            with get_db_session() as db:
+                if db is not None and db.get_bind().dialect.name == "postgresql":
+                    cutoff = datetime.utcnow() - timedelta(days=days)
+                    row = db.execute(DASHBOARD_STATS_SQL, {"cutoff": cutoff}).mappings().one()
+                    
+                    return {
+                        "total_conversations": row["total_conversations"] or 0,
+                        "unique_sessions": row["unique_sessions"] or 0,
+                        "avg_response_time_ms": float(row["avg_response_time_ms"]) if row["avg_response_time_ms"] else None,
+                        "positive_feedback": row["positive_feedback"] or 0,
+                        "negative_feedback": row["negative_feedback"] or 0,
+                        "conversations_by_day": row["conversations_by_day"],
+                        "channel_distribution": row["channel_distribution"],
+                        "top_queries": row["top_queries"]
+                    }
+        except Exception as e:
+            print(f"Dashboard stats query failed: {e}")
+    
+    return _get_dashboard_stats_per_metric(days)
+
+
+def _get_dashboard_stats_per_metric(days: int) -> Dict[str, Any]:
+    """Build get_dashboard_stats() from the individual stats helpers."""
+    stats = get_conversation_stats()
+    feedback = get_feedback_summary()
+    
+    channel_distribution = []
+    if is_database_available():
+        try:
+            with get_db_session() as db:
+                if db is not None:
+                    channels = db.query(
+                        ChatSession.channel,
+                        func.count(ChatSession.id).label('count')
+                    ).group_by(ChatSession.channel).all()
+                    channel_distribution = [{"channel": c.channel or "web", "count": c.count} for c in channels]
+        except Exception as e:
+            print(f"Channel distribution query failed: {e}")
+    
+    return {
+        "total_conversations": stats.get("total_conversations", 0),
+        "unique_sessions": stats.get("unique_sessions", 0),
+        "avg_response_time_ms": stats.get("avg_response_time_ms"),
+        "positive_feedback": feedback.get("positive", 0),
+        "negative_feedback": feedback.get("negative", 0),
+        "conversations_by_day": [
+            {"date": d["date"], "count": d["conversations"]}
+            for d in get_analytics_by_date(days)
+        ],
+        "channel_distribution": channel_distribution,
+        "top_queries": []
+    }
+
+
 def get_analytics_by_date(days: int = 30) -> List[Dict[str, Any]]:
     """Get daily analytics for the specified number of days."""
     if not is_database_available():
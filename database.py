@@ -10,14 +10,27 @@ PostgreSQL database for:
 import os
 from datetime import datetime
 from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey, UniqueConstraint
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base, relationship
+from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+# Connection pool sizing - keeps warm connections instead of reconnecting per request
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+
 if DATABASE_URL:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 else:
     engine = None
     SessionLocal = None
@@ -56,10 +69,19 @@ class ChatSession(Base):
     last_activity = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     channel = Column(String(50), default="web")
     
-    user = relationship("UserAccount", back_populates="sessions")
+    # lazy="raise": load the user explicitly (joinedload/selectinload) rather than one query per session
+    user = relationship("UserAccount", back_populates="sessions", lazy="raise")
     conversations = relationship("Conversation", back_populates="session")
 
 
+# Serves the admin session list's keyset pagination (ORDER BY last_activity DESC, id DESC);
+# created_at rides along so the date-range filter is checked from the index. Built
+# CONCURRENTLY by migrate_chat_indexes.py, never at app startup.
+CHAT_SESSION_INDEXES = {
+    "ix_chat_sessions_activity_seek": "ON chat_sessions (last_activity DESC, id DESC, created_at)",
+}
+
+
 class Conversation(Base):
     """Stores individual conversation exchanges."""
     __tablename__ = "conversations"
@@ -140,7 +162,7 @@ class ConversationSummary(Base):
 
 
 def init_database():
-    """Initialize database tables."""
+    """Initialize database tables and indexes."""
     if engine:
         Base.metadata.create_all(bind=engine)
         return True
@@ -149,11 +171,19 @@ def init_database():
 
 @contextmanager
 def get_db_session():
-    """Get a database session with automatic cleanup."""
+    """Get a database session with automatic cleanup.
+    
+    Sessions are scoped per thread. A nested call joins the session that is
+    already open and leaves commit/cleanup to the outermost caller.
+    """
     if SessionLocal is None:
         yield None
         return
     
+    if SessionLocal.registry.has():
+        yield SessionLocal()
+        return
+    
     session = SessionLocal()
     try:
         yield session
@@ -162,7 +192,35 @@ def get_db_session():
         session.rollback()
         raise
     finally:
-        session.close()
+        SessionLocal.remove()
+
+
+@contextmanager
+def get_raw_connection():
+    """Check out a pooled DBAPI connection for hand-written SQL.
+    
+    Commits on success, rolls back on error and always returns the
+    connection to the engine's pool. Yields None without a database.
+    """
+    if engine is None:
+        yield None
+        return
+    
+    conn = engine.raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def remove_db_session(exception=None):
+    """Return the current thread's session to the pool (Flask teardown hook)."""
+    if SessionLocal is not None:
+        SessionLocal.remove()
 
 
 def is_database_available():
@@ -233,17 +291,22 @@ def get_user_conversation_history(user_id: int, limit: int = 20):
         if db is None:
             return []
         
-        conversations = db.query(Conversation).join(ChatSession).filter(
+        # Only the three columns used below, fetched in one round-trip
+        rows = db.query(
+            Conversation.user_question,
+            Conversation.bot_answer,
+            Conversation.timestamp
+        ).join(ChatSession).filter(
             ChatSession.user_id == user_id
         ).order_by(Conversation.timestamp.desc()).limit(limit).all()
         
         return [
             {
-                'question': c.user_question,
-                'answer': c.bot_answer,
-                'timestamp': c.timestamp.isoformat() if c.timestamp else None
+                'question': question,
+                'answer': answer,
+                'timestamp': timestamp.isoformat() if timestamp else None
             }
-            for c in reversed(conversations)
+            for question, answer, timestamp in reversed(rows)
         ]
 
 
@@ -303,3 +366,213 @@ def upsert_conversation_summary(user_id: int, emotional_themes: str = None,
         
         db.commit()
         return True
+
+
+# The voice tables (voice_conversations, voice_messages) are written with raw
+# SQL rather than through the models above. The ANNA Voice dashboard reads a
+# per-day rollup of voice_messages instead of scanning the table per request.
+#
+# Per-day aggregates of voice_messages. The rollup is built from this, and the
+# dashboard runs the same SELECT live over the window's partial edge days.
+# Calls are kept as a per-day id list so a window can count distinct calls
+# exactly, including calls that span midnight.
+VOICE_DAILY_STATS_COLUMNS = """
+        DATE(timestamp) AS d,
+        array_agg(DISTINCT call_id) AS call_ids,
+        COUNT(*) AS msgs,
+        SUM(latency_ms) FILTER (WHERE latency_ms > 0) AS lat_sum,
+        COUNT(latency_ms) FILTER (WHERE latency_ms > 0) AS lat_n,
+        MIN(latency_ms) FILTER (WHERE latency_ms > 0) AS min_lat,
+        MAX(latency_ms) FILTER (WHERE latency_ms > 0) AS max_lat,
+        MAX(readiness_score) AS peak_r,
+        SUM(readiness_score) AS r_sum,
+        COUNT(readiness_score) AS r_n,
+        COUNT(*) FILTER (WHERE closure_type = 'booking_request') AS bookings,
+        COUNT(*) FILTER (WHERE role = 'user' AND readiness_zone = 'explore') AS z_explore,
+        COUNT(*) FILTER (WHERE role = 'user' AND readiness_zone = 'transition') AS z_transition,
+        COUNT(*) FILTER (WHERE role = 'user' AND readiness_zone = 'guide') AS z_guide
+"""
+
+# Bump when VOICE_DAILY_STATS_COLUMNS changes; an older rollup is rebuilt
+VOICE_DAILY_STATS_VERSION = "mv_voice_daily_stats v2"
+
+VOICE_ANALYTICS_DDL = (
+    f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS mv_voice_daily_stats AS
+    SELECT {VOICE_DAILY_STATS_COLUMNS}
+    FROM voice_messages
+    GROUP BY DATE(timestamp)
+    """,
+    f"COMMENT ON MATERIALIZED VIEW mv_voice_daily_stats IS '{VOICE_DAILY_STATS_VERSION}'",
+    # Required for REFRESH ... CONCURRENTLY
+    "CREATE UNIQUE INDEX IF NOT EXISTS mv_voice_daily_stats_d ON mv_voice_daily_stats (d)",
+)
+
+
+# Indexes behind the admin window filters, call transcripts and readiness
+# zones. Built CONCURRENTLY by migrate_voice_analytics.py, never at app
+# startup, so neither worker boot nor live voice writes wait on them.
+VOICE_MESSAGE_INDEXES = {
+    "idx_vm_ts": "ON voice_messages (timestamp DESC)",
+    "idx_vm_call_ts": "ON voice_messages (call_id, timestamp)",
+    "idx_vm_user_readiness": "ON voice_messages (timestamp) WHERE role = 'user' AND readiness_score IS NOT NULL",
+    "idx_vm_zone": "ON voice_messages (readiness_zone, timestamp) WHERE role = 'user' AND readiness_score IS NOT NULL",
+    # Rows arrive in time order, so a few KB of block ranges cover the window
+    # scans behind the rollup refresh and the export
+    "idx_vm_ts_brin": "ON voice_messages USING BRIN (timestamp) WITH (pages_per_range = 32)",
+}
+
+
+def _ensure_concurrent_indexes(table: str, indexes: dict) -> list:
+    """Build missing or INVALID indexes on a table, then refresh planner stats.
+    
+    An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind
+    under the same name; it is dropped and rebuilt rather than skipped.
+    Returns the names of the indexes built.
+    """
+    with get_raw_connection() as conn:
+        if conn is None:
+            return []
+        dbapi_conn = conn.dbapi_connection
+        dbapi_conn.rollback()  # the pool's pre-ping may have opened a transaction
+        dbapi_conn.autocommit = True  # CREATE INDEX CONCURRENTLY refuses to run in a transaction
+        try:
+            with dbapi_conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relname, i.indisvalid
+                    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE i.indrelid = %s::regclass
+                """, (table,))
+                existing = dict(cur.fetchall())
+                built = [name for name in indexes if not existing.get(name)]
+                for name in built:
+                    if name in existing:
+                        cur.execute(f"DROP INDEX CONCURRENTLY {name}")
+                    cur.execute(f"CREATE INDEX CONCURRENTLY {name} {indexes[name]}")
+                if built:
+                    cur.execute(f"ANALYZE {table}")
+        finally:
+            dbapi_conn.autocommit = False
+    return built
+
+
+def ensure_voice_message_indexes() -> list:
+    """Build missing or INVALID voice_messages indexes. Returns the names built."""
+    return _ensure_concurrent_indexes("voice_messages", VOICE_MESSAGE_INDEXES)
+
+
+def ensure_chat_session_indexes() -> list:
+    """Build missing or INVALID chat_sessions indexes. Returns the names built."""
+    return _ensure_concurrent_indexes("chat_sessions", CHAT_SESSION_INDEXES)
+
+
+# Malformed legacy rows become NULL instead of aborting the type change
+VOICE_SOURCES_SAFE_CAST = """
+    CREATE FUNCTION pg_temp.voice_sources_jsonb(value text) RETURNS jsonb
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    BEGIN
+        RETURN value::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def migrate_voice_message_sources() -> bool:
+    """Convert voice_messages.sources from JSON text to jsonb, once.
+    
+    The type change rewrites the table under an ACCESS EXCLUSIVE lock, so it
+    only runs from migrate_voice_analytics.py, never at app startup. Returns
+    True if the column was converted.
+    """
+    with get_raw_connection() as conn:
+        if conn is None:
+            return False
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'voice_messages' AND column_name = 'sources'"
+            )
+            row = cur.fetchone()
+            if not row or row[0] == 'jsonb':
+                return False
+            cur.execute("SET LOCAL lock_timeout = '10s'")  # give up rather than queue live writes behind us
+            cur.execute(VOICE_SOURCES_SAFE_CAST)
+            cur.execute(
+                "ALTER TABLE voice_messages ALTER COLUMN sources TYPE jsonb "
+                "USING pg_temp.voice_sources_jsonb(sources)"
+            )
+    return True
+
+
+# Readiness zone thresholds live in the table, so every reader buckets scores
+# the same way without repeating the CASE
+VOICE_READINESS_ZONE_COLUMN = """
+    ALTER TABLE voice_messages ADD COLUMN IF NOT EXISTS readiness_zone text
+    GENERATED ALWAYS AS (
+        CASE
+            WHEN readiness_score IS NULL THEN NULL
+            WHEN readiness_score < 0.20 THEN 'explore'
+            WHEN readiness_score < 0.35 THEN 'transition'
+            ELSE 'guide'
+        END
+    ) STORED
+"""
+
+
+def migrate_voice_readiness_zone() -> bool:
+    """Add the generated readiness_zone column to voice_messages, once.
+    
+    Adding a STORED generated column rewrites the table under an ACCESS
+    EXCLUSIVE lock, so it only runs from migrate_voice_analytics.py, never at
+    app startup. Returns True if the column was added.
+    """
+    with get_raw_connection() as conn:
+        if conn is None:
+            return False
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'voice_messages' AND column_name = 'readiness_zone'"
+            )
+            if cur.fetchone():
+                return False
+            cur.execute("SET LOCAL lock_timeout = '10s'")  # give up rather than queue live writes behind us
+            cur.execute(VOICE_READINESS_ZONE_COLUMN)
+    return True
+
+
+def _drop_outdated_voice_daily_stats(cur):
+    """Drop mv_voice_daily_stats if it was built from older columns."""
+    cur.execute(
+        "SELECT obj_description(to_regclass('mv_voice_daily_stats'), 'pg_class'), "
+        "to_regclass('mv_voice_daily_stats') IS NOT NULL"
+    )
+    version, exists = cur.fetchone()
+    if exists and version != VOICE_DAILY_STATS_VERSION:
+        cur.execute("DROP MATERIALIZED VIEW mv_voice_daily_stats")
+
+
+def init_voice_analytics():
+    """Create the voice dashboard rollup. Returns False without a database.
+    
+    Needs the readiness_zone column from migrate_voice_readiness_zone().
+    """
+    with get_raw_connection() as conn:
+        if conn is None:
+            return False
+        with conn.cursor() as cur:
+            _drop_outdated_voice_daily_stats(cur)
+            for statement in VOICE_ANALYTICS_DDL:
+                cur.execute(statement)
+    return True
+
+
+def refresh_voice_daily_stats():
+    """Rebuild mv_voice_daily_stats without blocking dashboard reads."""
+    with get_raw_connection() as conn:
+        if conn is None:
+            return
+        with conn.cursor() as cur:
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_voice_daily_stats")
@@ -0,0 +1,28 @@
+"""
+Gunicorn Configuration for the Anna Kitney Flask API Server
+
+Runs webhook_server.py on gevent workers so one process can keep many
+LLM, SSE and Postgres requests in flight while each waits on network I/O.
+
+Usage:
+    gunicorn -c gunicorn_conf.py webhook_server:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('WEBHOOK_PORT', 8080)}"
+
+worker_class = "gevent"
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Conversation histories, rate limiter state and VAPI call state are kept in
+# process memory, so a single worker is the default. Raise WEB_CONCURRENCY only
+# once that state lives in a shared store.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# Long-lived SSE streams are fine under gevent; this only bounds worker heartbeats.
+timeout = 120
+graceful_timeout = 30
+
+accesslog = "-"
+errorlog = "-"
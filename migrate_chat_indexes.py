@@ -0,0 +1,39 @@
+"""
+Migration script for the chat_sessions indexes.
+
+Builds the keyset pagination index behind the admin session list. Index
+builds run CONCURRENTLY and can take a while on a large table, so they live
+here instead of in app startup. Safe to re-run: existing indexes are skipped
+and interrupted builds are rebuilt.
+
+Usage:
+    python3 migrate_chat_indexes.py
+"""
+
+import sys
+from database import is_database_available, ensure_chat_session_indexes
+
+
+def main():
+    """Build any missing or INVALID chat_sessions index."""
+    print("=" * 60)
+    print("Chat Session Index Migration")
+    print("=" * 60)
+    
+    if not is_database_available():
+        print("Database not available")
+        return False
+    
+    try:
+        built = ensure_chat_session_indexes()
+        print(f"Built: {', '.join(built)}" if built else "All indexes valid")
+    except Exception as e:
+        print(f"Failed: {e}")
+        return False
+    
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
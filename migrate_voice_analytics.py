@@ -0,0 +1,68 @@
+"""
+Migration script for the ANNA Voice analytics schema.
+
+Converts voice_messages.sources to jsonb, adds the readiness_zone column and
+builds the voice_messages indexes and the mv_voice_daily_stats rollup that
+back the admin dashboard. The column changes rewrite the table and index
+builds can take a while on a large table, so they live here instead of in
+app startup. Safe to re-run: finished steps are skipped and interrupted
+index builds are rebuilt.
+
+Usage:
+    python3 migrate_voice_analytics.py
+"""
+
+import sys
+from database import is_database_available, migrate_voice_message_sources, migrate_voice_readiness_zone, init_voice_analytics, ensure_voice_message_indexes
+
+
+def main():
+    """Run each migration step; a failing step does not skip the others."""
+    print("=" * 60)
+    print("ANNA Voice Analytics Migration")
+    print("=" * 60)
+    
+    if not is_database_available():
+        print("Database not available")
+        return False
+    
+    success = True
+    
+    print("\n--- voice_messages.sources to jsonb ---")
+    try:
+        converted = migrate_voice_message_sources()
+        print("Converted; malformed rows set to NULL" if converted else "Already jsonb")
+    except Exception as e:
+        print(f"Failed: {e}")
+        success = False
+    
+    print("\n--- voice_messages.readiness_zone ---")
+    try:
+        added = migrate_voice_readiness_zone()
+        print("Added" if added else "Already present")
+    except Exception as e:
+        print(f"Failed: {e}")
+        success = False
+    
+    print("\n--- Dashboard Rollup ---")
+    try:
+        init_voice_analytics()
+        print("mv_voice_daily_stats ready")
+    except Exception as e:
+        print(f"Failed: {e}")
+        success = False
+    
+    print("\n--- voice_messages Indexes ---")
+    try:
+        built = ensure_voice_message_indexes()
+        print(f"Built: {', '.join(built)}" if built else "All indexes valid")
+    except Exception as e:
+        print(f"Failed: {e}")
+        success = False
+    
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
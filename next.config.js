@@ -38,6 +38,11 @@ const nextConfig = {
         source: '/api/channels/:path*',
         destination: 'http://localhost:8080/api/channels/:path*',
       },
+      {
+        // Proxied byte for byte, so the backend's gzip reaches the browser as-is
+        source: '/api/admin/somera/:path*',
+        destination: `${process.env.BACKEND_URL || 'http://localhost:8080'}/api/admin/somera/:path*`,
+      },
       {
         source: '/webhook/:path*',
         destination: 'http://localhost:8080/webhook/:path*',
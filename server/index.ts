@@ -8,7 +8,7 @@ const app = express();
 const httpServer = createServer(app);
 
 function startFlaskServer() {
-  const flask = spawn("python3", ["webhook_server.py"], {
+  const flask = spawn("python3", ["-m", "gunicorn", "-c", "gunicorn_conf.py", "webhook_server:app"], {
     cwd: process.cwd(),
     stdio: ["ignore", "pipe", "pipe"],
     detached: false,
@@ -507,8 +507,8 @@ export async function registerRoutes(
     try {
       const range = req.query.range || '7d';
       const limit = req.query.limit || '50';
-      const page = req.query.page || '1';
-      const response = await fetch(`${FLASK_API_URL}/api/admin/conversations?range=${range}&limit=${limit}&page=${page}`, {
+      const cursor = req.query.cursor ? `&cursor=${encodeURIComponent(String(req.query.cursor))}` : '';
+      const response = await fetch(`${FLASK_API_URL}/api/admin/conversations?range=${range}&limit=${limit}${cursor}`, {
         headers: {
           ...(INTERNAL_API_KEY && { "X-Internal-Api-Key": INTERNAL_API_KEY }),
         },
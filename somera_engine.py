@@ -13,7 +13,12 @@ def generate_somera_response(message: str, session_id: str = None, **kwargs) ->
     }
 
 def generate_somera_response_stream(message: str, session_id: str = None, **kwargs):
-    """Stub generator for Somera streaming response."""
+    """Stub generator for Somera streaming response.
+    
+    Sources are sent in a "sources" chunk before any content, as well as on
+    the final "done" chunk, so consumers that stop early still have them.
+    """
+    yield {"type": "sources", "sources": []}
     yield {"type": "content", "content": "This feature is not available."}
     yield {"type": "done", "full_response": "This feature is not available.", "sources": []}
 
@@ -42,11 +42,12 @@ export async function GET(request: NextRequest) {
 
     const { searchParams } = new URL(request.url);
     const range = searchParams.get('range') || '7d';
-    const page = searchParams.get('page') || '1';
     const limit = searchParams.get('limit') || '50';
+    const cursorParam = searchParams.get('cursor');
+    const cursor = cursorParam ? `&cursor=${encodeURIComponent(cursorParam)}` : '';
 
     const response = await fetch(
-      `${BACKEND_URL}/api/admin/conversations?range=${range}&page=${page}&limit=${limit}`,
+      `${BACKEND_URL}/api/admin/conversations?range=${range}&limit=${limit}${cursor}`,
       {
         method: 'GET',
         headers: {
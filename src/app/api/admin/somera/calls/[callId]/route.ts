@@ -1,31 +0,0 @@
-import { NextRequest, NextResponse } from 'next/server';
-
-const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8080';
-
-export async function GET(
-  request: NextRequest,
-  { params }: { params: { callId: string } }
-) {
-  try {
-    const callId = params.callId;
-    
-    const response = await fetch(`${BACKEND_URL}/api/admin/somera/calls/${encodeURIComponent(callId)}`, {
-      headers: {
-        'Content-Type': 'application/json',
-      },
-    });
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch call details');
-    }
-    
-    const data = await response.json();
-    return NextResponse.json(data);
-  } catch (error) {
-    console.error('Error fetching call details:', error);
-    return NextResponse.json(
-      { error: 'Failed to fetch call details' },
-      { status: 500 }
-    );
-  }
-}
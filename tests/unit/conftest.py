@@ -0,0 +1,85 @@
+"""
+Shared fixtures for the unit tests.
+
+Tests that need a real PostgreSQL database use the pg_database fixture and
+are skipped unless TEST_DATABASE_URL points at a scratch database. Its tables
+are dropped and recreated around each test.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def pg_database(monkeypatch):
+    """Point database.py at TEST_DATABASE_URL with fresh tables."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker, scoped_session
+    import database
+    
+    engine = create_engine(TEST_DATABASE_URL)
+    database.Base.metadata.drop_all(bind=engine)
+    database.Base.metadata.create_all(bind=engine)
+    
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "DATABASE_URL", TEST_DATABASE_URL)
+    monkeypatch.setattr(database, "SessionLocal", scoped_session(
+        sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ))
+    
+    yield engine
+    
+    database.Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+# The voice tables are created outside database.py's models; this mirrors the
+# production columns the Python side reads and writes
+VOICE_TABLES_DDL = """
+    CREATE TABLE voice_conversations (
+        id SERIAL PRIMARY KEY,
+        call_id TEXT UNIQUE NOT NULL,
+        started_at TIMESTAMP DEFAULT NOW(),
+        ended_at TIMESTAMP
+    );
+    CREATE TABLE voice_messages (
+        id SERIAL PRIMARY KEY,
+        call_id TEXT NOT NULL,
+        turn_number INTEGER,
+        role TEXT NOT NULL,
+        content TEXT,
+        readiness_score DOUBLE PRECISION,
+        readiness_recommendation TEXT,
+        latency_ms INTEGER,
+        closure_type TEXT,
+        sources TEXT,
+        timestamp TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+
+def _drop_voice_tables(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP MATERIALIZED VIEW IF EXISTS mv_voice_daily_stats")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS voice_messages, voice_conversations")
+
+
+@pytest.fixture
+def voice_database(pg_database):
+    """pg_database plus empty voice tables, before any voice migration."""
+    _drop_voice_tables(pg_database)
+    with pg_database.begin() as conn:
+        conn.exec_driver_sql(VOICE_TABLES_DDL)
+    
+    yield pg_database
+    
+    _drop_voice_tables(pg_database)
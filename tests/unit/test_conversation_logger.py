@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Unit tests for conversation_logger.py - Tests session creation alongside the
+logged turn and the dashboard stats fallbacks. The PostgreSQL tests need
+TEST_DATABASE_URL (see conftest.py).
+
+Run with: pytest tests/unit/test_conversation_logger.py -v
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import StaticPool
+
+import conversation_logger
+import database
+from conversation_logger import log_conversation, get_dashboard_stats
+from database import get_db_session, ChatSession
+
+
+@pytest.fixture
+def sqlite_database(monkeypatch, tmp_path):
+    """Point database.py at an in-memory SQLite database."""
+    url = "sqlite://"
+    engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(bind=engine)
+    
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "DATABASE_URL", url)
+    monkeypatch.setattr(database, "SessionLocal", scoped_session(
+        sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ))
+    monkeypatch.setattr(conversation_logger, "LOG_DIR", tmp_path)
+    monkeypatch.setattr(conversation_logger, "CONVERSATION_LOG_FILE", tmp_path / "conversations.json")
+    
+    yield engine
+    engine.dispose()
+
+
+def _fetch_all(engine, sql, **params):
+    with engine.connect() as conn:
+        return conn.execute(text(sql), params).fetchall()
+
+
+class TestLogConversationSession:
+    """Tests for the chat_sessions row created by log_conversation."""
+    
+    def test_creates_session_with_session_channel(self, pg_database):
+        """ManyChat logs a web turn against an instagram session."""
+        entry = log_conversation(
+            session_id="mc-1",
+            user_question="hi",
+            bot_answer="hello",
+            session_channel="instagram"
+        )
+        
+        assert entry["channel"] == "web"
+        assert entry.get("conversation_id") is not None
+        assert _fetch_all(pg_database, "SELECT channel FROM chat_sessions WHERE session_id = 'mc-1'") == [("instagram",)]
+    
+    def test_session_race_keeps_conversation_row(self, pg_database, monkeypatch):
+        """Losing the session insert race must not drop the conversation."""
+        def racing_ensure_session_exists(session_id, channel="web", user_id=None):
+            # Another request commits the session first...
+            with pg_database.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO chat_sessions (session_id, channel) VALUES (:sid, 'web')"),
+                    {"sid": session_id}
+                )
+            # ...after this one had already decided to insert it
+            with get_db_session() as db:
+                db.add(ChatSession(session_id=session_id, channel=channel))
+        
+        monkeypatch.setattr(conversation_logger, "ensure_session_exists", racing_ensure_session_exists)
+        monkeypatch.setattr(conversation_logger, "_log_to_file", lambda entry: pytest.fail("fell back to file logging"))
+        
+        entry = log_conversation(session_id="race-1", user_question="hi", bot_answer="hello")
+        
+        assert entry.get("conversation_id") is not None
+        assert _fetch_all(pg_database, "SELECT count(*) FROM conversations WHERE session_id = 'race-1'") == [(1,)]
+        assert _fetch_all(pg_database, "SELECT count(*) FROM chat_sessions WHERE session_id = 'race-1'") == [(1,)]
+
+
+class TestDashboardStats:
+    """Tests for get_dashboard_stats on each database backend."""
+    
+    def _log_turns(self):
+        log_conversation(session_id="dash-1", user_question="What is SOMERA?", bot_answer="a")
+        log_conversation(session_id="dash-1", user_question="what is somera? ", bot_answer="b")
+        log_conversation(session_id="dash-2", user_question="Events?", bot_answer="c", session_channel="instagram")
+    
+    def test_sqlite_uses_per_metric_fallback(self, sqlite_database):
+        """The single-query path is PostgreSQL only; SQLite must still get stats."""
+        self._log_turns()
+        
+        stats = get_dashboard_stats(7)
+        
+        assert stats["total_conversations"] == 3
+        assert stats["unique_sessions"] == 2
+        assert sum(day["count"] for day in stats["conversations_by_day"]) == 3
+        assert sorted((c["channel"], c["count"]) for c in stats["channel_distribution"]) == [("instagram", 1), ("web", 1)]
+        assert stats["top_queries"] == []
+    
+    def test_postgres_single_query(self, pg_database):
+        self._log_turns()
+        
+        stats = get_dashboard_stats(7)
+        
+        assert stats["total_conversations"] == 3
+        assert stats["unique_sessions"] == 2
+        assert sum(day["count"] for day in stats["conversations_by_day"]) == 3
+        assert sorted((c["channel"], c["count"]) for c in stats["channel_distribution"]) == [("instagram", 1), ("web", 1)]
+        assert stats["top_queries"][0]["count"] == 2
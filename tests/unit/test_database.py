@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Unit tests for database.py - Tests the ANNA Voice analytics and chat_sessions
+index migrations. They need TEST_DATABASE_URL (see conftest.py), and marking
+an index INVALID needs a superuser.
+
+Run with: pytest tests/unit/test_database.py -v
+"""
+
+import pytest
+
+from database import migrate_voice_message_sources, migrate_voice_readiness_zone, ensure_voice_message_indexes, ensure_chat_session_indexes, VOICE_MESSAGE_INDEXES, CHAT_SESSION_INDEXES
+
+
+def _index_validity(engine, table="voice_messages"):
+    with engine.connect() as conn:
+        return dict(conn.exec_driver_sql("""
+            SELECT c.relname, i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass
+        """, (table,)).fetchall())
+
+
+class TestVoiceMessageSources:
+    """Tests for migrate_voice_message_sources."""
+    
+    def test_malformed_sources_become_null(self, voice_database):
+        with voice_database.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO voice_messages (call_id, role, sources) VALUES "
+                "('c-ok', 'assistant', '[\"SOMERA program page\"]'), "
+                "('c-bad', 'assistant', '[\"truncated'), "
+                "('c-none', 'assistant', NULL)"
+            )
+        
+        assert migrate_voice_message_sources() is True
+        assert migrate_voice_message_sources() is False
+        
+        with voice_database.connect() as conn:
+            rows = dict(conn.exec_driver_sql("SELECT call_id, sources FROM voice_messages").fetchall())
+            data_type = conn.exec_driver_sql(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'voice_messages' AND column_name = 'sources'"
+            ).scalar()
+        assert data_type == "jsonb"
+        assert rows == {"c-ok": ["SOMERA program page"], "c-bad": None, "c-none": None}
+
+
+class TestVoiceReadinessZone:
+    """Tests for migrate_voice_readiness_zone."""
+    
+    def test_zone_generated_from_score(self, voice_database):
+        with voice_database.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO voice_messages (call_id, role, readiness_score) VALUES "
+                "('c-explore', 'user', 0.10), ('c-transition', 'user', 0.20), "
+                "('c-guide', 'user', 0.35), ('c-none', 'assistant', NULL)"
+            )
+        
+        assert migrate_voice_readiness_zone() is True
+        assert migrate_voice_readiness_zone() is False
+        
+        with voice_database.connect() as conn:
+            zones = dict(conn.exec_driver_sql("SELECT call_id, readiness_zone FROM voice_messages").fetchall())
+        assert zones == {"c-explore": "explore", "c-transition": "transition", "c-guide": "guide", "c-none": None}
+
+
+class TestVoiceMessageIndexes:
+    """Tests for ensure_voice_message_indexes."""
+    
+    def test_builds_missing_indexes_once(self, voice_database):
+        assert migrate_voice_readiness_zone()  # idx_vm_zone covers it
+        assert ensure_voice_message_indexes() == list(VOICE_MESSAGE_INDEXES)
+        assert ensure_voice_message_indexes() == []
+        
+        validity = _index_validity(voice_database)
+        assert all(validity[name] for name in VOICE_MESSAGE_INDEXES)
+    
+    @pytest.mark.parametrize("name", list(VOICE_MESSAGE_INDEXES))
+    def test_rebuilds_invalid_index(self, voice_database, name):
+        """An index left INVALID by an interrupted concurrent build is rebuilt."""
+        assert migrate_voice_readiness_zone()
+        ensure_voice_message_indexes()
+        with voice_database.begin() as conn:
+            conn.exec_driver_sql(
+                "UPDATE pg_index SET indisvalid = false WHERE indexrelid = %s::regclass", (name,)
+            )
+        
+        assert ensure_voice_message_indexes() == [name]
+        assert _index_validity(voice_database)[name] is True
+
+
+class TestChatSessionIndexes:
+    """Tests for ensure_chat_session_indexes."""
+    
+    def test_builds_seek_index_outside_create_all(self, pg_database):
+        assert "ix_chat_sessions_activity_seek" not in _index_validity(pg_database, "chat_sessions")
+        
+        assert ensure_chat_session_indexes() == list(CHAT_SESSION_INDEXES)
+        assert ensure_chat_session_indexes() == []
+        assert _index_validity(pg_database, "chat_sessions")["ix_chat_sessions_activity_seek"] is True
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Unit tests for webhook_server.py - Tests request parsing, session bookkeeping
+and the ANNA Voice admin helpers.
+
+Run with: pytest tests/unit/test_webhook_server.py -v
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+webhook_server = pytest.importorskip("webhook_server")
+
+
+@pytest.fixture
+def client():
+    webhook_server.app.config["TESTING"] = True
+    return webhook_server.app.test_client()
+
+
+class TestChatStreamSession:
+    """Tests for session creation around /api/chat/stream."""
+    
+    def test_session_created_when_stream_errors(self, client, monkeypatch):
+        """The chat_sessions row must exist even if the stream never completes."""
+        created = []
+        
+        def fake_ensure_session_exists(session_id, channel="web", user_id=None):
+            created.append((session_id, channel))
+        
+        def failing_stream(*args, **kwargs):
+            yield {"type": "error", "content": "upstream failed"}
+        
+        monkeypatch.setattr(webhook_server, "ensure_session_exists", fake_ensure_session_exists)
+        monkeypatch.setattr(webhook_server, "fix_typos_with_llm", lambda message: message)
+        monkeypatch.setattr(webhook_server, "generate_response_stream", failing_stream)
+        
+        response = client.post("/api/chat/stream", json={"message": "hello", "session_id": "stream-error-1"})
+        body = response.get_data()
+        
+        assert response.status_code == 200
+        assert b"upstream failed" in body
+        assert created == [("stream-error-1", "web")]
+
+
+class TestLogging:
+    """Tests for the queued module logger."""
+    
+    def test_stream_write_runs_on_another_os_thread(self):
+        from gevent import monkey
+        get_ident = monkey.get_original("_thread", "get_ident")
+        
+        class RecordingStream:
+            def __init__(self):
+                self.writes = []
+            
+            def write(self, text):
+                self.writes.append((text, get_ident()))
+            
+            def flush(self):
+                pass
+        
+        stream = RecordingStream()
+        wrapped = webhook_server._ThreadpoolStream(stream)
+        wrapped.write("line\n")
+        assert stream.writes == []
+        
+        wrapped.flush()
+        
+        [(text, thread_ident)] = stream.writes
+        assert text == "line\n"
+        assert thread_ident != get_ident()
+    
+    def test_context_has_session_and_remote(self):
+        import logging
+        record = logging.LogRecord("webhook_server", logging.ERROR, __file__, 1, "failed", None, None)
+        record.session_id = "ctx-1"
+        
+        with webhook_server.app.test_request_context(environ_base={"REMOTE_ADDR": "203.0.113.7"}):
+            assert webhook_server._add_log_context(record)
+        
+        assert record.context == " [session=ctx-1 remote=203.0.113.7]"
+    
+    def test_context_empty_outside_requests(self):
+        import logging
+        record = logging.LogRecord("webhook_server", logging.INFO, __file__, 1, "started", None, None)
+        
+        webhook_server._add_log_context(record)
+        
+        assert record.context == ""
+
+
+class TestJsonBody:
+    """Tests for _read_json_body via the JSON endpoints."""
+    
+    @pytest.mark.parametrize("path", ["/api/chat/reset", "/api/chat", "/api/feedback"])
+    def test_empty_body_is_400(self, client, path):
+        response = client.post(path, data=b"", content_type="application/json")
+        assert response.status_code == 400
+    
+    def test_malformed_body_is_400(self, client):
+        response = client.post("/api/chat/reset", data=b"{not json", content_type="application/json")
+        assert response.status_code == 400
+    
+    def test_non_object_body_is_400(self, client):
+        response = client.post("/api/chat/reset", data=b"[1, 2]", content_type="application/json")
+        assert response.status_code == 400
+    
+    def test_non_json_content_type_is_415(self, client):
+        response = client.post("/api/chat/reset", data=b'{"session_id": "x"}', content_type="text/plain")
+        assert response.status_code == 415
+    
+    def test_object_body_is_accepted(self, client):
+        response = client.post("/api/chat/reset", json={"session_id": "reset-1"})
+        assert response.status_code == 200
+
+
+class TestDbHealth:
+    """Tests for /api/admin/db-health."""
+    
+    def test_table_stats_in_one_query(self, client, pg_database, monkeypatch):
+        from sqlalchemy import event
+        from database import get_db_session, ChatSession, Conversation
+        monkeypatch.setattr(webhook_server, "INTERNAL_API_KEY", b"test-key")
+        headers = {"X-Internal-Api-Key": "test-key"}
+        
+        assert client.get("/api/admin/db-health", headers=headers).get_json()["latest_conversation"] is None
+        
+        with get_db_session() as db:
+            db.add(ChatSession(session_id="health-1", channel="web"))
+            db.add(Conversation(session_id="health-1", user_question="hi", bot_answer="hello"))
+        
+        statements = []
+        
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(pg_database, "before_cursor_execute", count_statement)
+        try:
+            body = client.get("/api/admin/db-health", headers=headers).get_json()
+        finally:
+            event.remove(pg_database, "before_cursor_execute", count_statement)
+        
+        assert body["connection_status"] == "connected"
+        assert body["tables"] == {"chat_sessions": 1, "conversations": 1}
+        assert body["latest_conversation"] is not None
+        assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+
+
+class TestAdminSessionPaging:
+    """Tests for keyset cursor paging on /api/admin/conversations."""
+    
+    HEADERS = {"X-Internal-Api-Key": "test-key"}
+    
+    @pytest.fixture(autouse=True)
+    def api_key(self, monkeypatch):
+        monkeypatch.setattr(webhook_server, "INTERNAL_API_KEY", b"test-key")
+    
+    @pytest.mark.parametrize("cursor", ["not-base64!", "bm8tc2VwYXJhdG9y", "MjAyNi0xMC0wMXxhYmM="])
+    def test_bad_cursor_is_400(self, client, monkeypatch, cursor):
+        monkeypatch.setattr(webhook_server, "is_database_available", lambda: True)
+        
+        response = client.get(f"/api/admin/conversations?cursor={cursor}", headers=self.HEADERS)
+        
+        assert response.status_code == 400
+        assert "Invalid cursor" in response.get_json()["error"]
+    
+    def test_pages_cover_every_session_once(self, client, pg_database):
+        from datetime import datetime, timedelta
+        from database import get_db_session, ChatSession
+        
+        now = datetime.utcnow()
+        with get_db_session() as db:
+            # Two sessions share a last_activity, so the id tiebreak matters, and
+            # three have none, so the last pages seek among NULLs
+            for i, minutes in enumerate([1, 2, 2, 3, 4, None, None, None]):
+                last_activity = now - timedelta(minutes=minutes) if minutes else None
+                db.add(ChatSession(session_id=f"page-{i}", channel="web", last_activity=last_activity))
+        
+        seen = []
+        cursor = None
+        while True:
+            query = "/api/admin/conversations?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            body = client.get(query, headers=self.HEADERS).get_json()
+            seen.extend(session["sessionId"] for session in body["sessions"])
+            if not body["hasMore"]:
+                break
+            cursor = body["nextCursor"]
+        
+        assert sorted(seen) == [f"page-{i}" for i in range(8)]
+        assert len(seen) == len(set(seen))
+
+
+class TestVoiceTokenFilter:
+    """Tests for voice_token_filter on streamed ANNA tokens."""
+    
+    def test_stops_after_max_sentences_and_closes_upstream(self):
+        closed = []
+        
+        def tokens():
+            try:
+                for i in range(10):
+                    yield f"Sentence {i}. "
+            finally:
+                closed.append(True)
+        
+        spoken = "".join(webhook_server.voice_token_filter(tokens()))
+        
+        assert spoken.count(".") == webhook_server.VOICE_MAX_SENTENCES
+        assert closed == [True]
+    
+    def test_strips_markdown_and_urls(self):
+        spoken = "".join(webhook_server.voice_token_filter(iter(["**Hi** there, ", "see https://x.io ", "now."])))
+        assert spoken == "Hi there, see now."
+    
+    def test_streamed_turn_keeps_sources_when_cut_short(self, client, monkeypatch):
+        """Sources must be recorded even though the 'done' chunk is never read."""
+        closed = []
+        saved = []
+        
+        def long_stream(*args, **kwargs):
+            try:
+                yield {"type": "sources", "sources": ["SOMERA program page"]}
+                for i in range(10):
+                    yield {"type": "content", "content": f"Sentence {i}. "}
+                yield {"type": "done", "sources": ["SOMERA program page"]}
+            finally:
+                closed.append(True)
+        
+        def fake_save(call_id, role, content, *args, **kwargs):
+            saved.append((role, kwargs.get("sources")))
+        
+        monkeypatch.setattr(webhook_server, "VAPI_WEBHOOK_SECRET", None)
+        monkeypatch.setattr(webhook_server, "generate_somera_response_stream", long_stream)
+        monkeypatch.setattr(webhook_server, "save_voice_message_async", fake_save)
+        
+        response = client.post("/api/vapi/chat/completions", json={
+            "stream": True,
+            "call": {"id": "call-sources-1"},
+            "messages": [{"role": "user", "content": "Tell me about SOMERA"}],
+        })
+        response.get_data()
+        
+        assert closed == [True]
+        assert ("assistant", ["SOMERA program page"]) in saved
+
+
+class TestTranscribeAudio:
+    """Tests for /api/transcribe around the ffmpeg steps."""
+    
+    def test_failed_segmenting_is_500_not_partial_transcript(self, client, monkeypatch):
+        import io
+        import subprocess
+        import openai
+        
+        def fake_run(cmd, **kwargs):
+            if cmd[0] == "ffmpeg":
+                # Both runs write their output, the segmenting one only partly
+                with open(cmd[-1].replace("%03d", "000"), "wb") as f:
+                    f.write(b"mp3")
+            returncode = 1 if "segment" in cmd else 0
+            return subprocess.CompletedProcess(cmd, returncode, stdout="1800.0", stderr="segment failed")
+        
+        monkeypatch.setattr(webhook_server, "INTERNAL_API_KEY", b"test-key")
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setattr(subprocess, "run", fake_run)
+        monkeypatch.setattr(openai, "OpenAI", lambda **kwargs: pytest.fail("transcribed partial segments"))
+        
+        response = client.post(
+            "/api/transcribe",
+            data={"file": (io.BytesIO(b"video"), "call.mp4")},
+            headers={"X-Internal-Api-Key": "test-key"},
+        )
+        
+        assert response.status_code == 500
+        assert "Failed to split audio" in response.get_json()["error"]
+
+
+class TestEndCallUtterance:
+    """Tests for is_end_call_utterance on VAPI transcripts."""
+    
+    @pytest.mark.parametrize("text", [
+        "okay, thanks, bye!", "Bye-bye.", "no thanks, that's all",
+        "I'm done for now, thanks", "Thank you very much. Have a great day!",
+    ])
+    def test_goodbye_only(self, text):
+        assert webhook_server.is_end_call_utterance(text)
+    
+    @pytest.mark.parametrize("text", ["bye but wait", "Goodbye, I have a question", "yeah okay", "what does bye mean"])
+    def test_goodbye_with_more_to_say(self, text):
+        assert not webhook_server.is_end_call_utterance(text)
+    
+    def test_long_repeated_goodbye_stays_linear(self):
+        """Overlapping phrases ("bye bye" vs "bye" + "bye") must not backtrack."""
+        import time
+        started = time.monotonic()
+        
+        assert not webhook_server.is_end_call_utterance("bye " * 2000 + "but actually wait")
+        assert webhook_server.is_end_call_utterance("thank you bye " * 2000)
+        assert time.monotonic() - started < 1
+
+
+class TestAdminGzip:
+    """Tests for Accept-Encoding negotiation in gzip_admin_response."""
+    
+    BODY = b'{"calls": []}' * 200
+    
+    def _get(self, accept_encoding, streamed=False):
+        from flask import Response
+        
+        def view():
+            body = iter([self.BODY]) if streamed else self.BODY
+            return Response(body, mimetype="application/json")
+        
+        headers = {"Accept-Encoding": accept_encoding} if accept_encoding is not None else {}
+        with webhook_server.app.test_request_context(headers=headers):
+            return webhook_server.gzip_admin_response(view)()
+    
+    @pytest.mark.parametrize("accept_encoding", ["gzip", "gzip, deflate, br", "deflate, gzip;q=0.5", "*"])
+    def test_compresses_when_gzip_accepted(self, accept_encoding):
+        import gzip
+        response = self._get(accept_encoding)
+        
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.vary
+        assert gzip.decompress(response.get_data()) == self.BODY
+    
+    @pytest.mark.parametrize("accept_encoding", [None, "identity", "gzip;q=0", "x-gzip", "deflate"])
+    def test_plain_when_gzip_refused(self, accept_encoding):
+        response = self._get(accept_encoding)
+        
+        assert "Content-Encoding" not in response.headers
+        assert "Accept-Encoding" in response.vary
+        assert response.get_data() == self.BODY
+    
+    def test_streamed_response_compressed(self):
+        import gzip
+        response = self._get("gzip", streamed=True)
+        
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.get_data()) == self.BODY
+
+
+class TestVoiceMessageBuffering:
+    """Tests for the per-call voice message buffer and its batched writes."""
+    
+    @pytest.fixture
+    def timers(self, monkeypatch):
+        timers = []
+        monkeypatch.setattr(webhook_server.gevent, "spawn_later", lambda *args: timers.append(args))
+        return timers
+    
+    @pytest.fixture
+    def write_queue(self, monkeypatch, timers):
+        """A fresh write queue the background writer is not reading from."""
+        import queue
+        from collections import defaultdict
+        
+        monkeypatch.setattr(webhook_server, "_db_write_queue", queue.Queue(maxsize=2))
+        monkeypatch.setattr(webhook_server, "_voice_message_buffer", defaultdict(list))
+        monkeypatch.setattr(webhook_server, "voice_call_turn_counts", {})
+        return webhook_server._db_write_queue
+    
+    @staticmethod
+    def _queued(write_queue):
+        items = []
+        while not write_queue.empty():
+            items.append(write_queue.get_nowait())
+        return items
+    
+    def test_full_buffer_flushes_without_waiting(self, write_queue, timers):
+        for i in range(webhook_server.VOICE_MESSAGE_BATCH_SIZE - 1):
+            webhook_server.save_voice_message_async("call-size", "user", f"turn {i}")
+        assert write_queue.empty()
+        assert timers == [(webhook_server.VOICE_MESSAGE_FLUSH_SECONDS, webhook_server.flush_voice_messages, "call-size")]
+        
+        webhook_server.save_voice_message_async("call-size", "assistant", "reply")
+        
+        [(kind, rows)] = self._queued(write_queue)
+        assert kind == "voice"
+        assert len(rows) == webhook_server.VOICE_MESSAGE_BATCH_SIZE
+        assert "call-size" not in webhook_server._voice_message_buffer
+    
+    def test_end_of_call_flushes_pending_rows(self, write_queue):
+        webhook_server.save_voice_message_async("call-end", "user", "hi")
+        webhook_server.save_voice_message_async("call-end", "assistant", "hello", latency_ms=800, sources=["page"])
+        webhook_server.save_voice_message_async("call-end", "user", "bye")
+        
+        webhook_server.flush_voice_messages("call-end")
+        webhook_server.flush_voice_messages("call-end")  # nothing left to hand over
+        
+        [(kind, rows)] = self._queued(write_queue)
+        assert [(row[1], row[2], row[8]) for row in rows] == [(1, "user", None), (1, "assistant", '["page"]'), (2, "user", None)]
+    
+    def test_full_queue_drops_and_logs(self, write_queue, monkeypatch):
+        errors = []
+        monkeypatch.setattr(webhook_server.logger, "error", lambda message, *args: errors.append(message % args))
+        write_queue.put_nowait(("voice", []))
+        write_queue.put_nowait(("voice", []))
+        
+        webhook_server.save_voice_message_async("call-full", "user", "hi")
+        webhook_server.flush_voice_messages("call-full")
+        
+        assert len(self._queued(write_queue)) == 2
+        assert errors == ["[Voice DB Async] Write queue full, dropped 1 messages for call call-full"]
+    
+    def test_no_connection_logs_dropped_rows(self, monkeypatch):
+        from contextlib import contextmanager
+        
+        @contextmanager
+        def no_connection():
+            yield None
+        
+        errors = []
+        monkeypatch.setattr(webhook_server, "get_raw_connection", no_connection)
+        monkeypatch.setattr(webhook_server.logger, "error", lambda message, *args: errors.append(message % args))
+        
+        webhook_server._write_voice_messages([("call-none",) + (None,) * 9] * 3)
+        
+        assert errors == ["[Voice DB Async] Database unavailable, dropped 3 messages"]
+    
+    def test_conversation_row_created_once(self, voice_database, monkeypatch):
+        from datetime import datetime, timezone
+        monkeypatch.setattr(webhook_server, "_voice_conversations_started", {})
+        
+        def row(turn, role):
+            return ("call-db", turn, role, "x", None, None, None, None, None, datetime.now(timezone.utc))
+        
+        webhook_server._write_voice_messages([row(1, "user"), row(1, "assistant")])
+        webhook_server._write_voice_messages([row(2, "user")])
+        # A restarted worker has no memory of the call and relies on ON CONFLICT
+        webhook_server._voice_conversations_started.clear()
+        webhook_server._write_voice_messages([row(2, "assistant")])
+        
+        with voice_database.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM voice_conversations").scalar() == 1
+            assert conn.exec_driver_sql("SELECT count(*) FROM voice_messages WHERE call_id = 'call-db'").scalar() == 4
+
+
+# The pre-rollup stats queries, kept as the reference for window parity
+BASELINE_TOTALS_SQL = """
+    SELECT
+        COUNT(DISTINCT call_id), COUNT(*),
+        AVG(CASE WHEN latency_ms > 0 THEN latency_ms END),
+        MAX(readiness_score), AVG(readiness_score),
+        COUNT(CASE WHEN closure_type = 'booking_request' THEN 1 END)
+    FROM voice_messages
+    WHERE timestamp >= NOW() - make_interval(days => %s)
+"""
+BASELINE_TREND_SQL = """
+    SELECT
+        to_char(DATE(timestamp), 'Mon DD'),
+        MIN(CASE WHEN latency_ms > 0 THEN latency_ms END),
+        AVG(CASE WHEN latency_ms > 0 THEN latency_ms END),
+        MAX(CASE WHEN latency_ms > 0 THEN latency_ms END)
+    FROM voice_messages
+    WHERE timestamp >= NOW() - make_interval(days => %s)
+    GROUP BY DATE(timestamp)
+    ORDER BY DATE(timestamp)
+"""
+BASELINE_ZONES_SQL = """
+    SELECT
+        CASE
+            WHEN readiness_score < 0.20 THEN 'explore'
+            WHEN readiness_score < 0.35 THEN 'transition'
+            ELSE 'guide'
+        END,
+        COUNT(*)
+    FROM voice_messages
+    WHERE role = 'user' AND readiness_score IS NOT NULL
+        AND timestamp >= NOW() - make_interval(days => %s)
+    GROUP BY 1
+"""
+
+# (call_id, offset from now, role, readiness_score, latency_ms, closure_type)
+VOICE_SEED_ROWS = [
+    ("c-recent", "30 minutes", "user", 0.10, None, None),
+    ("c-recent", "29 minutes", "assistant", None, 820, None),
+    ("c-day", "23 hours", "user", 0.25, None, None),
+    ("c-day", "23 hours", "assistant", None, 1430, "booking_request"),
+    ("c-edge-24h", "25 hours", "user", 0.40, None, None),
+    ("c-edge-24h", "25 hours", "assistant", None, 990, None),
+    ("c-2d", "47 hours", "user", 0.18, None, None),
+    ("c-2d", "47 hours", "assistant", None, 0, None),
+    ("c-5d", "5 days 3 hours", "user", 0.36, None, None),
+    ("c-5d", "5 days 3 hours", "assistant", None, 1710, None),
+    ("c-edge-7d", "7 days 1 hour", "user", 0.22, None, None),
+    ("c-edge-7d", "7 days 1 hour", "assistant", None, 640, "booking_request"),
+    ("c-12d", "12 days", "user", 0.05, None, None),
+    ("c-12d", "12 days", "assistant", None, 2210, None),
+    ("c-edge-30d", "29 days 23 hours", "user", 0.31, None, None),
+    ("c-edge-30d", "29 days 23 hours", "assistant", None, 1180, None),
+    ("c-old", "30 days 2 hours", "user", 0.50, None, None),
+    ("c-old", "30 days 2 hours", "assistant", None, 3000, None),
+]
+
+
+class TestSomeraStatsWindow:
+    """The rollup-backed /stats must match the live rolling-window queries."""
+    
+    def _seed(self, engine):
+        with engine.begin() as conn:
+            for call_id, offset, role, score, latency, closure in VOICE_SEED_ROWS:
+                conn.exec_driver_sql(
+                    "INSERT INTO voice_messages (call_id, role, content, readiness_score, latency_ms, closure_type, timestamp) "
+                    "VALUES (%s, %s, 'x', %s, %s, %s, NOW() - %s::interval)",
+                    (call_id, role, score, latency, closure, offset)
+                )
+            # Calls that span midnight, five days ago and last night
+            for call_id, midnight in (("c-midnight-5d", "date_trunc('day', NOW()) - interval '5 days'"),
+                                      ("c-midnight-1d", "date_trunc('day', NOW())")):
+                for minutes, latency in ((-10, 700), (10, 900)):
+                    conn.exec_driver_sql(
+                        "INSERT INTO voice_messages (call_id, role, content, readiness_score, latency_ms, timestamp) "
+                        f"VALUES (%s, 'user', 'x', 0.3, %s, LEAST(NOW(), {midnight} + make_interval(mins => %s)))",
+                        (call_id, latency, minutes)
+                    )
+    
+    def _baseline(self, engine, days):
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(BASELINE_TOTALS_SQL, (days,))
+            calls, messages, avg_latency, peak, avg_readiness, bookings = cur.fetchone()
+            cur.execute(BASELINE_TREND_SQL, (days,))
+            trend = [
+                {"date": d, "min": float(lo or 0), "avg": float(avg or 0), "max": float(hi or 0)}
+                for d, lo, avg, hi in cur.fetchall()
+            ]
+            cur.execute(BASELINE_ZONES_SQL, (days,))
+            zones = {"explore": 0, "transition": 0, "guide": 0}
+            zones.update(dict(cur.fetchall()))
+        finally:
+            conn.close()
+        
+        return {
+            "totalCalls": calls,
+            "totalMessages": messages,
+            "avgLatency": round(float(avg_latency or 0), 1),
+            "peakReadiness": round(float(peak or 0) * 100, 1),
+            "avgReadiness": round(float(avg_readiness or 0) * 100, 1),
+            "bookingRate": round(bookings / calls * 100, 1) if calls else 0,
+            "latencyTrends": trend,
+            "readinessDistribution": zones,
+        }
+    
+    @staticmethod
+    def _normalize(value):
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, dict):
+            return {k: TestSomeraStatsWindow._normalize(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [TestSomeraStatsWindow._normalize(v) for v in value]
+        return value
+    
+    @pytest.mark.parametrize("range_param,days", [("24h", 1), ("7d", 7), ("30d", 30)])
+    def test_totals_match_baseline(self, client, voice_database, range_param, days):
+        from database import migrate_voice_readiness_zone, init_voice_analytics, refresh_voice_daily_stats
+        
+        self._seed(voice_database)
+        assert migrate_voice_readiness_zone()
+        assert init_voice_analytics()
+        refresh_voice_daily_stats()
+        # Written after the refresh, so only the live edge of the query sees it
+        with voice_database.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO voice_messages (call_id, role, content, latency_ms, timestamp) "
+                "VALUES ('c-after-refresh', 'assistant', 'x', 555, NOW() - interval '5 minutes')"
+            )
+        webhook_server._somera_stats_cache.clear()
+        
+        response = client.get(f"/api/admin/somera/stats?range={range_param}")
+        
+        assert response.status_code == 200
+        assert self._normalize(response.get_json()) == self._normalize(self._baseline(voice_database, days))
+
+
+class TestSomeraPreparedStatements:
+    """Tests for per-statement PREPARE on pooled connections."""
+    
+    def test_call_list_works_without_rollup(self, client, voice_database):
+        """A missing rollup only breaks /stats, and /stats recovers once it exists."""
+        from database import migrate_voice_readiness_zone, init_voice_analytics
+        webhook_server._somera_stats_cache.clear()
+        
+        assert client.get("/api/admin/somera/stats?range=7d").status_code == 500
+        assert client.get("/api/admin/somera/calls?range=7d").get_json() == {"calls": []}
+        assert client.get("/api/admin/somera/calls/none").get_json() == {"callId": "none", "messages": []}
+        
+        assert migrate_voice_readiness_zone()
+        assert init_voice_analytics()
+        assert client.get("/api/admin/somera/stats?range=7d").status_code == 200
+    
+    def test_reprepares_statement_left_on_connection(self, client, voice_database):
+        """A statement prepared but never recorded must not fail with 'already exists'."""
+        assert client.get("/api/admin/somera/calls?range=7d").status_code == 200
+        
+        from database import get_raw_connection
+        with get_raw_connection() as conn:
+            conn.info["somera_admin_prepared"].clear()
+        
+        assert client.get("/api/admin/somera/calls?range=7d").status_code == 200
+
+
+class TestSomeraCsvExport:
+    """Tests for the CSV stream behind /api/admin/somera/export."""
+    
+    def test_failure_partway_aborts_the_download(self, client, monkeypatch):
+        """A cut-short CSV must not end like a complete one."""
+        from contextlib import contextmanager
+        
+        class FailingCursor:
+            def __init__(self):
+                self.batches = [[("c-1",) + ("",) * 8]]
+            
+            def execute(self, *args):
+                pass
+            
+            def fetchmany(self, size):
+                if self.batches:
+                    return self.batches.pop()
+                raise RuntimeError("connection lost")
+        
+        class FakeConnection:
+            def cursor(self, name=None):
+                return FailingCursor()
+        
+        @contextmanager
+        def fake_raw_connection():
+            yield FakeConnection()
+        
+        monkeypatch.setattr(webhook_server, "is_database_available", lambda: True)
+        monkeypatch.setattr(webhook_server, "get_raw_connection", fake_raw_connection)
+        
+        response = client.get("/api/admin/somera/export?range=7d")
+        
+        assert response.status_code == 200
+        with pytest.raises(RuntimeError, match="connection lost"):
+            response.get_data()
+
+
+class TestSomeraParquetExport:
+    """Tests for ?format=parquet on /api/admin/somera/export."""
+    
+    def test_missing_pyarrow_is_501(self, client, monkeypatch):
+        monkeypatch.setattr(webhook_server, "pq", None)
+        monkeypatch.setattr(webhook_server, "is_database_available", lambda: True)
+        
+        response = client.get("/api/admin/somera/export?format=parquet")
+        
+        assert response.status_code == 501
+    
+    def test_streams_one_row_group_per_batch(self, client, voice_database, monkeypatch):
+        import io
+        pq = pytest.importorskip("pyarrow.parquet")
+        monkeypatch.setattr(webhook_server, "SOMERA_PARQUET_BATCH_ROWS", 2)
+        with voice_database.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO voice_conversations (call_id) VALUES ('c-1'), ('c-2')")
+            conn.exec_driver_sql(
+                "INSERT INTO voice_messages (call_id, role, content, readiness_score, readiness_recommendation, latency_ms) VALUES "
+                "('c-1', 'user', 'hi', 0.3, 'transition', NULL), ('c-1', 'assistant', 'hello', NULL, NULL, 900), "
+                "('c-2', 'user', 'book', 0.5, 'guide', NULL)"
+            )
+        
+        response = client.get("/api/admin/somera/export?format=parquet&range=7d")
+        
+        assert response.status_code == 200
+        assert response.is_streamed
+        parquet = pq.ParquetFile(io.BytesIO(response.get_data()))
+        assert parquet.metadata.num_row_groups == 2
+        table = parquet.read()
+        assert sorted(table.column("message").to_pylist()) == ["book", "hello", "hi"]
+        assert sorted(filter(None, table.column("readiness_recommendation").to_pylist())) == ["guide", "transition"]
@@ -6,11 +6,43 @@ Flask-based API server handling:
 - Instagram webhooks (via Meta Graph API)
 - Direct API access for custom integrations
 - React frontend API endpoints
+
+Runs on gevent (see gunicorn_conf.py): the stdlib is monkey-patched before any
+other import so sockets, threads and sleeps yield to the event loop.
 """
 
+from gevent import monkey
+monkey.patch_all()
+
 import os
+import sys
+import time
+import hmac
+import hashlib
+import decimal
 import json
-from flask import Flask, request, jsonify, Response
+import csv
+import io
+import gzip
+import zlib
+import queue
+import itertools
+import bisect
+import atexit
+import threading
+import traceback
+import logging
+import gevent
+import orjson
+from collections import deque, defaultdict
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extensions import DECIMAL, new_type, register_type
+from psycopg2.extras import execute_values, NamedTupleCursor
+from logging.handlers import QueueHandler, QueueListener
+from cachetools import TTLCache
+from flask import Flask, request, jsonify, Response, stream_with_context, abort, has_request_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 
 from channel_handlers import (
@@ -21,23 +53,157 @@ from channel_handlers import (
 )
 from chatbot_engine import generate_response, generate_response_stream, generate_conversation_summary, fix_typos_with_llm
 from intent_router import refresh_router_data
-from somera_engine import generate_somera_response, generate_somera_response_stream
+from somera_engine import generate_somera_response, generate_somera_response_stream, is_booking_request, get_voice_friendly_booking_response
 from conversation_logger import log_feedback, log_conversation, ensure_session_exists
-from database import get_or_create_user, get_user_conversation_history, get_conversation_summary, upsert_conversation_summary, init_database, is_database_available, get_db_session, ChatSession, Conversation
+from database import get_or_create_user, get_user_conversation_history, get_conversation_summary, upsert_conversation_summary, init_database, is_database_available, get_db_session, get_raw_connection, refresh_voice_daily_stats, remove_db_session, ChatSession, Conversation, VOICE_DAILY_STATS_COLUMNS
 from knowledge_base import initialize_knowledge_base, get_knowledge_base_stats
 from rate_limiter import rate_limiter, get_client_ip
 
+try:
+    from readiness_scoring import calculate_readiness_score
+except ImportError:
+    # Optional voice scoring module; without it every turn scores as "explore"
+    calculate_readiness_score = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Declared in pyproject; a build without it still serves the CSV export and answers 501 for Parquet
+    pa = pq = None
+
+
+class _ThreadpoolStream:
+    """Stream wrapper that performs the blocking write on the gevent hub's threadpool.
+    
+    After monkey.patch_all the QueueListener's thread is a greenlet on the hub's
+    OS thread, so writing to stderr from it would still stall every request.
+    Each flush hands the pending text to a real thread and yields until it lands.
+    """
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._pending = []
+    
+    def write(self, text: str):
+        self._pending.append(text)
+    
+    def flush(self):
+        text = "".join(self._pending)
+        self._pending = []
+        if text:
+            gevent.get_hub().threadpool.apply(self._write, (text,))
+    
+    def _write(self, text: str):
+        self._stream.write(text)
+        self._stream.flush()
+
+
+def _add_log_context(record: logging.LogRecord) -> bool:
+    """Append session_id (from extra=) and the client address to a record.
+    
+    Runs in the logging greenlet before the record is queued, while the
+    request context is still available.
+    """
+    remote = getattr(record, "remote", None)
+    if remote is None and has_request_context():
+        remote = request.remote_addr
+    session_id = getattr(record, "session_id", None)
+    context = [f"session={session_id}"] if session_id else []
+    if remote:
+        context.append(f"remote={remote}")
+    record.context = f" [{' '.join(context)}]" if context else ""
+    return True
+
+
+def _configure_logger() -> logging.Logger:
+    """Module logger that hands records to a listener for the stderr write.
+    
+    Request handlers only enqueue. The listener formats each record and does
+    the blocking write through _ThreadpoolStream, so a slow stderr does not
+    stall the hub. Level comes from LOG_LEVEL (default INFO).
+    """
+    log = logging.getLogger("webhook_server")
+    log.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(_ThreadpoolStream(sys.stderr))
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s%(context)s"))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_add_log_context)
+    log.addHandler(queue_handler)
+    return log
+
+
+logger = _configure_logger()
+
+
+def _patch_psycopg_for_gevent():
+    """Make psycopg2 wait on Postgres through the gevent hub instead of blocking."""
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+    
+    def gevent_wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+    
+    extensions.set_wait_callback(gevent_wait_callback)
+
+
+_patch_psycopg_for_gevent()
+
+
+def _orjson_default(obj):
+    """Types orjson does not encode natively, rendered the way Flask's default provider does."""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify() encodes straight to bytes."""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS),
+            mimetype="application/json"
+        )
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
+app.teardown_appcontext(remove_db_session)
 
 # Initialize database tables on startup (ensures tables exist in production)
 try:
     if init_database():
-        print("[Startup] Database tables initialized successfully")
+        logger.info("[Startup] Database tables initialized successfully")
     else:
-        print("[Startup] Warning: Database not available")
+        logger.warning("[Startup] Database not available")
 except Exception as e:
-    print(f"[Startup] Warning: Database initialization error: {e}")
+    logger.warning("[Startup] Database initialization error: %s", e)
 
 KNOWLEDGE_BASE_READY = False
 
@@ -51,21 +217,23 @@ def init_knowledge_base_on_startup():
     try:
         stats = get_knowledge_base_stats()
         if stats["total_chunks"] == 0:
-            print("[Startup] Knowledge base is empty, rebuilding from website...")
+            logger.info("[Startup] Knowledge base is empty, rebuilding from website...")
             initialize_knowledge_base(force_refresh=False, enable_web_scrape=True)
             stats = get_knowledge_base_stats()
             if stats["total_chunks"] == 0:
-                print("[CRITICAL] Knowledge base rebuild failed - no chunks available!")
-                print("[CRITICAL] Exiting to prevent serving degraded traffic.")
+                logger.critical("Knowledge base rebuild failed - no chunks available! "
+                                "Exiting to prevent serving degraded traffic.")
+                logging.shutdown()
                 import sys
                 sys.exit(1)
-            print(f"[Startup] Knowledge base rebuilt with {stats['total_chunks']} chunks")
+            logger.info("[Startup] Knowledge base rebuilt with %d chunks", stats['total_chunks'])
         else:
-            print(f"[Startup] Knowledge base ready with {stats['total_chunks']} chunks")
+            logger.info("[Startup] Knowledge base ready with %d chunks", stats['total_chunks'])
         KNOWLEDGE_BASE_READY = True
     except Exception as e:
-        print(f"[CRITICAL] Failed to initialize knowledge base: {e}")
-        print("[CRITICAL] Exiting to prevent serving degraded traffic.")
+        logger.critical("Failed to initialize knowledge base: %s. "
+                        "Exiting to prevent serving degraded traffic.", e)
+        logging.shutdown()
         import sys
         sys.exit(1)
 
@@ -74,15 +242,101 @@ init_knowledge_base_on_startup()
 # Initialize IntentRouter with current event titles and program names
 try:
     refresh_router_data()
-    print("[Startup] IntentRouter initialized with event/program data")
+    logger.info("[Startup] IntentRouter initialized with event/program data")
 except Exception as e:
-    print(f"[Startup] Warning: IntentRouter initialization failed: {e}")
+    logger.warning("[Startup] IntentRouter initialization failed: %s", e)
+
+# Per-session chat histories, bounded by size and idle time so abandoned
+# sessions are evicted instead of accumulating for the life of the worker
+HISTORY_CACHE_MAX_SESSIONS = int(os.environ.get("HISTORY_CACHE_MAX_SESSIONS", 50000))
+HISTORY_CACHE_TTL_SECONDS = int(os.environ.get("HISTORY_CACHE_TTL_SECONDS", 3600))
+
+# Histories are deques so each turn's append evicts the oldest messages in place
+CHAT_HISTORY_MAXLEN = 100
+SOMERA_HISTORY_MAXLEN = 50
+MANYCHAT_HISTORY_MAXLEN = 20
+VOICE_HISTORY_MAXLEN = 20
+
+conversation_histories = TTLCache(maxsize=HISTORY_CACHE_MAX_SESSIONS, ttl=HISTORY_CACHE_TTL_SECONDS)
 
-conversation_histories = {}
+# (session_id, email) -> (user_id, first name) for signed-in sessions warm in this worker
+session_users = TTLCache(maxsize=HISTORY_CACHE_MAX_SESSIONS, ttl=HISTORY_CACHE_TTL_SECONDS)
 
 import re
 
 
+def _read_json_body() -> dict:
+    """Parse a JSON object request body with orjson.
+    
+    Fails the way request.get_json() did: 415 unless the body is sent as
+    JSON, 400 if it is empty, malformed or not a JSON object.
+    """
+    if not request.is_json:
+        abort(415)
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        abort(400)
+    if not isinstance(data, dict):
+        abort(400)
+    return data
+
+
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+# OpenAI-style end-of-stream marker for the VAPI custom LLM streams
+_SSE_DONE = _SSE_PREFIX + b"[DONE]" + _SSE_SUFFIX
+
+
+def _sse(chunk: dict) -> bytes:
+    """Format a stream chunk as a Server-Sent Events data frame."""
+    return b"".join((_SSE_PREFIX, orjson.dumps(chunk), _SSE_SUFFIX))
+
+
+# Post-response work (conversation logging, LLM summaries) runs here so the
+# HTTP response can close as soon as the user has their answer
+background_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BACKGROUND_WORKERS", 8)),
+    thread_name_prefix="background"
+)
+
+
+def _update_conversation_summary(user_id: int, history: list):
+    """Regenerate and store the user's conversation summary."""
+    try:
+        summary = generate_conversation_summary(history)
+        if summary:
+            upsert_conversation_summary(
+                user_id=user_id,
+                emotional_themes=summary.get('emotional_themes'),
+                recommended_programs=summary.get('recommended_programs'),
+                last_topics=summary.get('last_topics'),
+                conversation_status=summary.get('conversation_status')
+            )
+    except Exception as e:
+        logger.error("Error updating conversation summary for user %s: %s", user_id, e)
+
+
+def _finalize_stream_turn(session_id: str, user_id: int, message: str, full_response: str,
+                          sources: list, safety_triggered: bool, history: list):
+    """Log a completed streamed turn and refresh the user's summary."""
+    try:
+        log_conversation(
+            session_id=session_id,
+            user_question=message,
+            bot_answer=full_response,
+            safety_flagged=safety_triggered,
+            sources=sources,
+            channel="web",
+            user_id=user_id
+        )
+    except Exception as e:
+        logger.error("Error logging streamed conversation: %s", e, extra={"session_id": session_id})
+    
+    if user_id and len(history) >= 4:
+        _update_conversation_summary(user_id, history)
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint.
@@ -112,17 +366,18 @@ def db_health_check():
     
     if is_database_available():
         try:
-            from sqlalchemy import func
+            from sqlalchemy import func, select
             with get_db_session() as db:
                 if db:
-                    result["tables"]["chat_sessions"] = db.query(func.count(ChatSession.id)).scalar() or 0
-                    result["tables"]["conversations"] = db.query(func.count(Conversation.id)).scalar() or 0
-                    
-                    latest = db.query(Conversation).order_by(Conversation.timestamp.desc()).first()
-                    if latest:
-                        result["latest_conversation"] = latest.timestamp.isoformat() if latest.timestamp else None
-                    else:
-                        result["latest_conversation"] = None
+                    # One round-trip for all three figures
+                    sessions, conversations, latest = db.query(
+                        select(func.count(ChatSession.id)).scalar_subquery(),
+                        select(func.count(Conversation.id)).scalar_subquery(),
+                        select(func.max(Conversation.timestamp)).scalar_subquery()
+                    ).one()
+                    result["tables"]["chat_sessions"] = sessions or 0
+                    result["tables"]["conversations"] = conversations or 0
+                    result["latest_conversation"] = latest.isoformat() if latest else None
                     
                     result["connection_status"] = "connected"
                 else:
@@ -173,6 +428,10 @@ def get_canonical_webhook_url(endpoint: str) -> str:
     return None
 
 
+# Base URL env vars are fixed for the life of the process, so resolve once
+CANONICAL_WHATSAPP_WEBHOOK_URL = get_canonical_webhook_url("webhook/whatsapp")
+
+
 @app.route("/webhook/whatsapp", methods=["POST"])
 def whatsapp_webhook():
     """Handle incoming WhatsApp messages via Twilio."""
@@ -182,19 +441,21 @@ def whatsapp_webhook():
     signature = request.headers.get("X-Twilio-Signature", "")
     
     if not signature:
-        print(f"WhatsApp webhook: Rejected request - missing X-Twilio-Signature header. Remote: {request.remote_addr}")
+        logger.warning("WhatsApp webhook: Rejected request - missing X-Twilio-Signature header. Remote: %s", request.remote_addr)
         return "Missing signature", 403
     
-    canonical_url = get_canonical_webhook_url("webhook/whatsapp")
+    canonical_url = CANONICAL_WHATSAPP_WEBHOOK_URL
     if not canonical_url:
-        print("WhatsApp webhook: WEBHOOK_BASE_URL or REPLIT_DEV_DOMAIN must be set for signature validation")
+        logger.error("WhatsApp webhook: WEBHOOK_BASE_URL or REPLIT_DEV_DOMAIN must be set for signature validation")
         return "Server configuration error", 500
     
-    if not whatsapp_handler.validate_request(signature, canonical_url, request.form.to_dict()):
-        print(f"WhatsApp webhook: Rejected request - invalid signature. URL: {canonical_url}, Remote: {request.remote_addr}")
+    form = request.form
+    
+    if not whatsapp_handler.validate_request(signature, canonical_url, form):
+        logger.warning("WhatsApp webhook: Rejected request - invalid signature. URL: %s, Remote: %s", canonical_url, request.remote_addr)
         return "Invalid signature", 403
     
-    twiml_response = whatsapp_handler.handle_webhook(request.form.to_dict())
+    twiml_response = whatsapp_handler.handle_webhook(form)
     
     return twiml_response, 200, {"Content-Type": "application/xml"}
 
@@ -219,26 +480,120 @@ def instagram_webhook():
     if not instagram_handler.is_configured():
         return jsonify({"error": "Instagram not configured"}), 503
     
-    data = request.get_json()
+    data = _read_json_body()
     
     result = instagram_handler.handle_webhook(data)
     
     return jsonify(result), 200
 
 
+def _build_topic_summary(stored_summary: dict):
+    """Condense a stored conversation summary into a one-line topic recap."""
+    return " | ".join(part for part in (
+        f"emotional issues: {stored_summary['emotional_themes']}" if stored_summary.get('emotional_themes') else None,
+        f"programs suggested: {stored_summary['recommended_programs']}" if stored_summary.get('recommended_programs') else None,
+        f"topic: {stored_summary['last_topics']}" if stored_summary.get('last_topics') else None,
+    ) if part) or None
+
+
+def _resolve_verified_user(session_id: str, verified_user: dict):
+    """Resolve the signed-in user for a chat session.
+    
+    The first message of a session looks the user up (creating the account if
+    needed). Follow-up messages in a session that is still warm in this worker
+    reuse that result instead of hitting the database again.
+    
+    Returns:
+        Tuple of (user_id, user_name, is_returning_user)
+    """
+    if not verified_user or not session_id.startswith("user_"):
+        return None, None, False
+    
+    email = verified_user.get("email")
+    if not email:
+        return None, None, False
+    
+    cache_key = (session_id, email)
+    if session_id in conversation_histories and cache_key in session_users:
+        user_id, user_name = session_users[cache_key]
+        return user_id, user_name, False
+    
+    name = verified_user.get("name")
+    user_data, created = get_or_create_user(
+        channel="google",
+        external_id=email,
+        email=email,
+        display_name=name,
+        profile_image=verified_user.get("image")
+    )
+    if not user_data:
+        return None, None, False
+    
+    user_id = user_data['id']
+    user_name = name.split()[0] if name else None
+    session_users[cache_key] = (user_id, user_name)
+    
+    return user_id, user_name, not created and session_id not in conversation_histories
+
+
+def _hydrate_session_history(session_id: str, user_id: int, is_returning_user: bool, client_history: list):
+    """Get the in-memory history for a session, seeding it on first sight.
+    
+    Returning users are seeded from their stored conversations; when a stored
+    summary exists only the last two exchanges are kept and the summary recap is used
+    instead. Otherwise falls back to the history sent by the client.
+    
+    Returns:
+        Tuple of (history deque, last topic summary or None)
+    """
+    last_topic_summary = None
+    
+    if session_id not in conversation_histories:
+        history = deque(maxlen=CHAT_HISTORY_MAXLEN)
+        
+        if is_returning_user and user_id:
+            # Both lookups share one session, so hydration costs a single connection checkout
+            with get_db_session():
+                stored_summary = get_conversation_summary(user_id)
+                past_history = get_user_conversation_history(user_id, limit=50)
+            
+            history.extend(itertools.chain.from_iterable(
+                ({"role": "user", "content": conv['question']},
+                 {"role": "assistant", "content": conv['answer']})
+                for conv in past_history or []
+            ))
+            
+            if stored_summary:
+                last_topic_summary = _build_topic_summary(stored_summary)
+                if last_topic_summary:
+                    while len(history) > 4:
+                        history.popleft()
+        
+        conversation_histories[session_id] = history
+    
+    if client_history and not conversation_histories[session_id]:
+        conversation_histories[session_id] = deque(client_history, maxlen=CHAT_HISTORY_MAXLEN)
+    
+    return conversation_histories[session_id], last_topic_summary
+
+
+# Shared secrets are read once at import; changing them requires a restart
+INTERNAL_API_KEY = os.environ.get("INTERNAL_API_KEY", "").encode()
+VAPI_WEBHOOK_SECRET = os.environ.get("VAPI_WEBHOOK_SECRET", "").encode()
+
+
 def validate_internal_api_key():
     """Validate the internal API key from trusted Next.js server."""
-    expected_key = os.environ.get("INTERNAL_API_KEY")
-    if not expected_key:
+    if not INTERNAL_API_KEY:
         return False
     provided_key = request.headers.get("X-Internal-Api-Key", "")
-    return provided_key == expected_key
+    return hmac.compare_digest(provided_key.encode(), INTERNAL_API_KEY)
 
 
 @app.route("/api/chat", methods=["POST"])
 def api_chat():
     """Direct API endpoint for chat integration - used by React frontend."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
@@ -256,64 +611,15 @@ def api_chat():
     original_message = message
     message = fix_typos_with_llm(message)
     
-    user_id = None
-    is_returning_user = False
-    user_name = None
-    
-    if verified_user and session_id.startswith("user_"):
-        email = verified_user.get("email")
-        name = verified_user.get("name")
-        image = verified_user.get("image")
-        
-        if email:
-            user_data, created = get_or_create_user(
-                channel="google",
-                external_id=email,
-                email=email,
-                display_name=name,
-                profile_image=image
-            )
-            if user_data:
-                user_id = user_data['id']
-                user_name = name.split()[0] if name else None
-                is_returning_user = not created and session_id not in conversation_histories
-    
-    ensure_session_exists(session_id, channel="web", user_id=user_id)
-    
-    last_topic_summary = None
-    stored_summary = None
-    
-    if session_id not in conversation_histories:
-        conversation_histories[session_id] = []
-        
-        if is_returning_user and user_id:
-            stored_summary = get_conversation_summary(user_id)
-            
-            past_history = get_user_conversation_history(user_id, limit=50)
-            if past_history:
-                for conv in past_history:
-                    conversation_histories[session_id].append({"role": "user", "content": conv['question']})
-                    conversation_histories[session_id].append({"role": "assistant", "content": conv['answer']})
-            
-            if stored_summary:
-                summary_parts = []
-                if stored_summary.get('emotional_themes'):
-                    summary_parts.append(f"emotional issues: {stored_summary['emotional_themes']}")
-                if stored_summary.get('recommended_programs'):
-                    summary_parts.append(f"programs suggested: {stored_summary['recommended_programs']}")
-                if stored_summary.get('last_topics'):
-                    summary_parts.append(f"topic: {stored_summary['last_topics']}")
-                last_topic_summary = " | ".join(summary_parts) if summary_parts else None
-                
-                if last_topic_summary:
-                    conversation_histories[session_id] = conversation_histories[session_id][-4:]
+    user_id, user_name, is_returning_user = _resolve_verified_user(session_id, verified_user)
     
-    if conversation_history and not conversation_histories[session_id]:
-        conversation_histories[session_id] = conversation_history
+    history, last_topic_summary = _hydrate_session_history(
+        session_id, user_id, is_returning_user, conversation_history
+    )
     
     result = generate_response(
         message,
-        conversation_histories[session_id],
+        list(history),
         user_name=user_name,
         is_returning_user=is_returning_user,
         last_topic_summary=last_topic_summary
@@ -328,30 +634,20 @@ def api_chat():
         safety_flagged=result.get("safety_triggered", False),
         safety_category=result.get("safety_category"),
         sources=result.get("sources", []),
-        channel="web"
+        channel="web",
+        user_id=user_id
     )
     
     conversation_id = logged_entry.get("conversation_id") if logged_entry else None
     
-    conversation_histories[session_id].append({"role": "user", "content": message})
-    conversation_histories[session_id].append({"role": "assistant", "content": response_text})
+    history.append({"role": "user", "content": message})
+    history.append({"role": "assistant", "content": response_text})
     
-    if len(conversation_histories[session_id]) > 100:
-        conversation_histories[session_id] = conversation_histories[session_id][-100:]
+    # Re-assign every turn so the idle TTL restarts from this activity
+    conversation_histories[session_id] = history
     
-    if user_id and len(conversation_histories[session_id]) >= 4:
-        try:
-            summary = generate_conversation_summary(conversation_histories[session_id])
-            if summary:
-                upsert_conversation_summary(
-                    user_id=user_id,
-                    emotional_themes=summary.get('emotional_themes'),
-                    recommended_programs=summary.get('recommended_programs'),
-                    last_topics=summary.get('last_topics'),
-                    conversation_status=summary.get('conversation_status')
-                )
-        except Exception as e:
-            print(f"Error updating conversation summary: {e}")
+    if user_id and len(history) >= 4:
+        background_executor.submit(_update_conversation_summary, user_id, list(history))
     
     return jsonify({
         "response": result.get("response", "I apologize, but I encountered an issue. Please try again."),
@@ -368,12 +664,17 @@ def api_chat():
 @app.route("/api/chat/stream", methods=["POST"])
 def api_chat_stream():
     """Streaming chat endpoint using Server-Sent Events."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
     message = data.get("message")
+    
+    # Reject empty messages before they cost a captcha lookup or a rate-limit slot
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
     session_id = data.get("session_id", "anonymous")
     conversation_history = data.get("conversation_history", [])
     
@@ -399,72 +700,24 @@ def api_chat_stream():
             }), 429
         return jsonify({"error": reason, "rate_limited": True}), 429
     
-    rate_limiter.log_request(client_ip, session_id, "/api/chat/stream", message[:50] if message else "")
+    rate_limiter.log_request(client_ip, session_id, "/api/chat/stream", message[:50])
     rate_limiter.record_request(client_ip, session_id)
     
     is_trusted_request = validate_internal_api_key()
     verified_user = data.get("verified_user") if is_trusted_request else None
     
-    if not message:
-        return jsonify({"error": "Message is required"}), 400
-    
     original_message = message
     message = fix_typos_with_llm(message)
     
-    user_id = None
-    is_returning_user = False
-    user_name = None
-    
-    if verified_user and session_id.startswith("user_"):
-        email = verified_user.get("email")
-        name = verified_user.get("name")
-        image = verified_user.get("image")
-        
-        if email:
-            user_data, created = get_or_create_user(
-                channel="google",
-                external_id=email,
-                email=email,
-                display_name=name,
-                profile_image=image
-            )
-            if user_data:
-                user_id = user_data['id']
-                user_name = name.split()[0] if name else None
-                is_returning_user = not created and session_id not in conversation_histories
-    
-    ensure_session_exists(session_id, channel="web", user_id=user_id)
-    
-    last_topic_summary = None
-    stored_summary = None
+    user_id, user_name, is_returning_user = _resolve_verified_user(session_id, verified_user)
     
-    if session_id not in conversation_histories:
-        conversation_histories[session_id] = []
-        
-        if is_returning_user and user_id:
-            stored_summary = get_conversation_summary(user_id)
-            
-            past_history = get_user_conversation_history(user_id, limit=50)
-            if past_history:
-                for conv in past_history:
-                    conversation_histories[session_id].append({"role": "user", "content": conv['question']})
-                    conversation_histories[session_id].append({"role": "assistant", "content": conv['answer']})
-            
-            if stored_summary:
-                summary_parts = []
-                if stored_summary.get('emotional_themes'):
-                    summary_parts.append(f"emotional issues: {stored_summary['emotional_themes']}")
-                if stored_summary.get('recommended_programs'):
-                    summary_parts.append(f"programs suggested: {stored_summary['recommended_programs']}")
-                if stored_summary.get('last_topics'):
-                    summary_parts.append(f"topic: {stored_summary['last_topics']}")
-                last_topic_summary = " | ".join(summary_parts) if summary_parts else None
-                
-                if last_topic_summary:
-                    conversation_histories[session_id] = conversation_histories[session_id][-4:]
+    history, last_topic_summary = _hydrate_session_history(
+        session_id, user_id, is_returning_user, conversation_history
+    )
     
-    if conversation_history and not conversation_histories[session_id]:
-        conversation_histories[session_id] = conversation_history
+    # The turn is only logged once the stream completes, so create the session
+    # row up front; a stream that errors or is cancelled still leaves it behind
+    ensure_session_exists(session_id, channel="web", user_id=user_id)
     
     def generate():
         full_response = ""
@@ -473,51 +726,33 @@ def api_chat_stream():
         
         for chunk in generate_response_stream(
             message,
-            conversation_histories[session_id],
+            list(history),
             user_name=user_name,
             is_returning_user=is_returning_user,
             last_topic_summary=last_topic_summary
         ):
             if chunk["type"] == "content":
                 full_response += chunk["content"]
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
+                gevent.sleep(0)
             elif chunk["type"] == "done":
                 sources = chunk.get("sources", [])
                 safety_triggered = chunk.get("safety_triggered", False)
                 full_response = chunk.get("full_response", full_response)
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
             elif chunk["type"] == "error":
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
                 return
         
-        log_conversation(
-            session_id=session_id,
-            user_question=message,
-            bot_answer=full_response,
-            safety_flagged=safety_triggered,
-            sources=sources,
-            channel="web"
-        )
-        
-        conversation_histories[session_id].append({"role": "user", "content": message})
-        conversation_histories[session_id].append({"role": "assistant", "content": full_response})
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": full_response})
         
-        if len(conversation_histories[session_id]) > 100:
-            conversation_histories[session_id] = conversation_histories[session_id][-100:]
+        conversation_histories[session_id] = history
         
-        if user_id and len(conversation_histories[session_id]) >= 4:
-            try:
-                summary = generate_conversation_summary(conversation_histories[session_id])
-                if summary:
-                    upsert_conversation_summary(
-                        user_id=user_id,
-                        emotional_themes=summary.get('emotional_themes'),
-                        recommended_programs=summary.get('recommended_programs'),
-                        last_topics=summary.get('last_topics'),
-                        conversation_status=summary.get('conversation_status')
-                    )
-            except Exception as e:
-                print(f"Error updating conversation summary: {e}")
+        background_executor.submit(
+            _finalize_stream_turn,
+            session_id, user_id, message, full_response, sources, safety_triggered, list(history)
+        )
     
     return Response(
         generate(),
@@ -534,12 +769,12 @@ def api_chat_stream():
 # ANNA ENDPOINTS - Empathetic Coaching Assistant
 # ============================================================================
 
-somera_conversation_histories = {}
+somera_conversation_histories = TTLCache(maxsize=HISTORY_CACHE_MAX_SESSIONS, ttl=HISTORY_CACHE_TTL_SECONDS)
 
 @app.route("/api/somera", methods=["POST"])
 def api_somera():
     """ANNA coaching endpoint - empathetic responses using Anna's coaching style."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
@@ -554,22 +789,22 @@ def api_somera():
     message = fix_typos_with_llm(message)
     
     if session_id not in somera_conversation_histories:
-        somera_conversation_histories[session_id] = []
+        somera_conversation_histories[session_id] = deque(maxlen=SOMERA_HISTORY_MAXLEN)
+    history = somera_conversation_histories[session_id]
     
     result = generate_somera_response(
         message, 
-        somera_conversation_histories[session_id],
+        list(history),
         user_name=user_name
     )
     
     answer = result.get("response", "I'm here to support you. Could you tell me more?")
     sources = result.get("sources", [])
     
-    somera_conversation_histories[session_id].append({"role": "user", "content": message})
-    somera_conversation_histories[session_id].append({"role": "assistant", "content": answer})
+    history.append({"role": "user", "content": message})
+    history.append({"role": "assistant", "content": answer})
     
-    if len(somera_conversation_histories[session_id]) > 50:
-        somera_conversation_histories[session_id] = somera_conversation_histories[session_id][-50:]
+    somera_conversation_histories[session_id] = history
     
     return jsonify({
         "response": answer,
@@ -581,12 +816,17 @@ def api_somera():
 @app.route("/api/somera/stream", methods=["POST"])
 def api_somera_stream():
     """Streaming ANNA coaching endpoint using Server-Sent Events."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
     message = data.get("message")
+    
+    # Reject empty messages before they cost a captcha lookup or a rate-limit slot
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
     session_id = data.get("session_id", "anonymous")
     user_name = data.get("user_name")
     
@@ -612,16 +852,14 @@ def api_somera_stream():
             }), 429
         return jsonify({"error": reason, "rate_limited": True}), 429
     
-    rate_limiter.log_request(client_ip, session_id, "/api/somera/stream", message[:50] if message else "")
+    rate_limiter.log_request(client_ip, session_id, "/api/somera/stream", message[:50])
     rate_limiter.record_request(client_ip, session_id)
     
-    if not message:
-        return jsonify({"error": "Message is required"}), 400
-    
     message = fix_typos_with_llm(message)
     
     if session_id not in somera_conversation_histories:
-        somera_conversation_histories[session_id] = []
+        somera_conversation_histories[session_id] = deque(maxlen=SOMERA_HISTORY_MAXLEN)
+    history = somera_conversation_histories[session_id]
     
     def generate():
         full_response = ""
@@ -629,24 +867,24 @@ def api_somera_stream():
         
         for chunk in generate_somera_response_stream(
             message, 
-            somera_conversation_histories[session_id],
+            list(history),
             user_name=user_name
         ):
             if chunk["type"] == "content":
                 full_response += chunk["content"]
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
+                gevent.sleep(0)
             elif chunk["type"] == "done":
                 sources = chunk.get("sources", [])
                 full_response = chunk.get("full_response", full_response)
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
             elif chunk["type"] == "error":
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield _sse(chunk)
         
-        somera_conversation_histories[session_id].append({"role": "user", "content": message})
-        somera_conversation_histories[session_id].append({"role": "assistant", "content": full_response})
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": full_response})
         
-        if len(somera_conversation_histories[session_id]) > 50:
-            somera_conversation_histories[session_id] = somera_conversation_histories[session_id][-50:]
+        somera_conversation_histories[session_id] = history
     
     return Response(
         generate(),
@@ -662,7 +900,7 @@ def api_somera_stream():
 @app.route("/api/chat/manychat", methods=["POST"])
 def api_chat_manychat():
     """ManyChat Dynamic Content endpoint for Instagram/Facebook integration."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({
@@ -694,16 +932,15 @@ def api_chat_manychat():
     message = fix_typos_with_llm(message)
     
     if session_id not in conversation_histories:
-        conversation_histories[session_id] = []
-    
-    ensure_session_exists(session_id, channel="instagram", user_id=None)
+        conversation_histories[session_id] = deque(maxlen=MANYCHAT_HISTORY_MAXLEN)
+    history = conversation_histories[session_id]
     
     try:
         result = generate_response(
             message, 
-            conversation_histories[session_id],
+            list(history),
             user_name=first_name if first_name else None,
-            is_returning_user=len(conversation_histories[session_id]) > 0,
+            is_returning_user=len(history) > 0,
             last_topic_summary=None
         )
         
@@ -711,18 +948,18 @@ def api_chat_manychat():
         sources = result.get("sources", [])
         safety_triggered = result.get("safety_triggered", False)
         
-        conversation_histories[session_id].append({"role": "user", "content": message})
-        conversation_histories[session_id].append({"role": "assistant", "content": answer})
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": answer})
         
-        if len(conversation_histories[session_id]) > 20:
-            conversation_histories[session_id] = conversation_histories[session_id][-20:]
+        conversation_histories[session_id] = history
         
         log_conversation(
             session_id=session_id,
             user_question=original_message,
             bot_answer=answer,
             sources=sources,
-            safety_flagged=safety_triggered
+            safety_flagged=safety_triggered,
+            session_channel="instagram"
         )
         
         return jsonify({
@@ -735,7 +972,7 @@ def api_chat_manychat():
         })
         
     except Exception as e:
-        print(f"ManyChat endpoint error: {e}")
+        logger.error("ManyChat endpoint error: %s", e, extra={"session_id": session_id})
         return jsonify({
             "version": "v2",
             "content": {
@@ -749,11 +986,10 @@ def api_chat_manychat():
 @app.route("/api/chat/reset", methods=["POST"])
 def api_chat_reset():
     """Reset conversation for a session."""
-    data = request.get_json()
+    data = _read_json_body()
     session_id = data.get("session_id", "anonymous")
     
-    if session_id in conversation_histories:
-        del conversation_histories[session_id]
+    conversation_histories.pop(session_id, None)
     
     return jsonify({
         "status": "success",
@@ -764,7 +1000,7 @@ def api_chat_reset():
 @app.route("/api/feedback", methods=["POST"])
 def api_feedback():
     """Submit feedback for a response."""
-    data = request.get_json()
+    data = _read_json_body()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
@@ -791,7 +1027,7 @@ def api_feedback():
             "message": "Feedback recorded"
         })
     except Exception as e:
-        print(f"Error logging feedback: {e}")
+        logger.error("Error logging feedback: %s", e, extra={"session_id": session_id})
         return jsonify({
             "status": "error",
             "message": "Failed to record feedback"
@@ -802,12 +1038,34 @@ def api_feedback():
 # Admin Dashboard API Endpoints
 # =============================================================================
 
-from conversation_logger import (
-    get_conversation_stats, get_analytics_by_date, get_feedback_summary,
-    get_recent_logs, get_session_history
-)
+from conversation_logger import get_dashboard_stats
 from database import ChatSession, Conversation, UserAccount, get_db_session, is_database_available
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, tuple_, update
+from sqlalchemy.orm import joinedload
+import base64
+from datetime import datetime, timezone
+
+
+def _encode_session_cursor(session: ChatSession) -> str:
+    """Opaque cursor pointing just past a session in last-activity order."""
+    last_activity = session.last_activity.isoformat() if session.last_activity else ""
+    raw = f"{last_activity}|{session.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_session_cursor(cursor: str):
+    """Inverse of _encode_session_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        last_activity, session_pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(last_activity) if last_activity else None, int(session_pk)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+# Dashboard stats move on conversation timescales, so polls within the TTL share one computation
+ADMIN_STATS_CACHE_TTL_SECONDS = int(os.environ.get("ADMIN_STATS_CACHE_TTL_SECONDS", 60))
+_admin_stats_cache = TTLCache(maxsize=8, ttl=ADMIN_STATS_CACHE_TTL_SECONDS)
+
 
 @app.route("/api/admin/stats", methods=["GET"])
 def admin_stats():
@@ -823,31 +1081,24 @@ def admin_stats():
     elif range_param == "30d":
         days = 30
     
+    cached = _admin_stats_cache.get(days)
+    if cached is not None:
+        return jsonify(cached)
+    
     try:
-        stats = get_conversation_stats()
-        daily_data = get_analytics_by_date(days)
-        feedback = get_feedback_summary()
+        stats = get_dashboard_stats(days)
         
-        total_feedback = feedback.get("positive", 0) + feedback.get("negative", 0)
+        total_feedback = stats["positive_feedback"] + stats["negative_feedback"]
         satisfaction = 0
         if total_feedback > 0:
-            satisfaction = round((feedback.get("positive", 0) / total_feedback) * 100)
+            satisfaction = round((stats["positive_feedback"] / total_feedback) * 100)
         
-        channel_dist = []
-        if is_database_available():
-            with get_db_session() as db:
-                if db:
-                    channels = db.query(
-                        ChatSession.channel,
-                        func.count(ChatSession.id).label('count')
-                    ).group_by(ChatSession.channel).all()
-                    channel_dist = [{"channel": c.channel or "web", "count": c.count} for c in channels]
+        channel_dist = stats["channel_distribution"]
         
         conversations_by_day = []
-        for d in daily_data:
+        for d in stats["conversations_by_day"]:
             date_str = d.get("date", "")
             if date_str:
-                from datetime import datetime
                 try:
                     dt = datetime.strptime(date_str, "%Y-%m-%d")
                     formatted = dt.strftime("%b %d")
@@ -855,12 +1106,12 @@ def admin_stats():
                     formatted = date_str
                 conversations_by_day.append({
                     "date": formatted,
-                    "count": d.get("conversations", 0)
+                    "count": d.get("count", 0)
                 })
         
-        top_queries = []
+        top_queries = stats["top_queries"]
         
-        return jsonify({
+        payload = {
             "totalConversations": stats.get("total_conversations", 0),
             "totalSessions": stats.get("unique_sessions", 0),
             "avgResponseTime": round((stats.get("avg_response_time_ms") or 0) / 1000, 1),
@@ -868,9 +1119,12 @@ def admin_stats():
             "conversationsByDay": conversations_by_day,
             "channelDistribution": channel_dist if channel_dist else [{"channel": "Widget", "count": stats.get("total_conversations", 0)}],
             "topQueries": top_queries
-        })
+        }
+        _admin_stats_cache[days] = payload
+        
+        return jsonify(payload)
     except Exception as e:
-        print(f"Admin stats error: {e}")
+        logger.error("Admin stats error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -881,8 +1135,8 @@ def admin_conversations():
         return jsonify({"error": "Unauthorized"}), 401
     
     range_param = request.args.get("range", "7d")
-    page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 50))
+    cursor = request.args.get("cursor")
     
     days = 7
     if range_param == "24h":
@@ -891,7 +1145,12 @@ def admin_conversations():
         days = 30
     
     if not is_database_available():
-        return jsonify({"sessions": [], "total": 0})
+        return jsonify({"sessions": [], "hasMore": False, "nextCursor": None})
+    
+    try:
+        seek_after = _decode_session_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
         from datetime import datetime, timedelta
@@ -899,54 +1158,81 @@ def admin_conversations():
         
         with get_db_session() as db:
             if db is None:
-                return jsonify({"sessions": [], "total": 0})
+                return jsonify({"sessions": [], "hasMore": False, "nextCursor": None})
             
-            total = db.query(func.count(ChatSession.id)).filter(
-                ChatSession.created_at >= cutoff
-            ).scalar() or 0
+            # Per-session message count and opening question as correlated subqueries,
+            # so the whole page (including the user join) comes back in one round-trip
+            message_count = db.query(func.count(Conversation.id)).filter(
+                Conversation.session_id == ChatSession.session_id
+            ).correlate(ChatSession).scalar_subquery()
             
-            sessions = db.query(ChatSession).filter(
+            first_message = db.query(Conversation.user_question).filter(
+                Conversation.session_id == ChatSession.session_id
+            ).order_by(Conversation.timestamp).limit(1).correlate(ChatSession).scalar_subquery()
+            
+            # Keyset pagination: seek past the previous page's last (last_activity, id)
+            # so deep pages cost the same as the first one
+            query = db.query(
+                ChatSession,
+                message_count.label("message_count"),
+                first_message.label("first_message"),
+                UserAccount.id,
+                UserAccount.display_name,
+                UserAccount.email
+            ).outerjoin(
+                UserAccount, UserAccount.id == ChatSession.user_id
+            ).filter(
                 ChatSession.created_at >= cutoff
-            ).order_by(desc(ChatSession.last_activity)).offset((page - 1) * limit).limit(limit).all()
+            )
+            
+            # Sessions with a last_activity come first; any without one follow by id,
+            # so a cursor can seek within either group. One extra row tells us
+            # whether another page exists without a COUNT(*).
+            rows = []
+            if seek_after is None or seek_after[0] is not None:
+                dated = query.filter(ChatSession.last_activity.isnot(None))
+                if seek_after:
+                    dated = dated.filter(tuple_(ChatSession.last_activity, ChatSession.id) < seek_after)
+                rows = dated.order_by(
+                    desc(ChatSession.last_activity), desc(ChatSession.id)
+                ).limit(limit + 1).all()
+            if len(rows) <= limit:
+                undated = query.filter(ChatSession.last_activity.is_(None))
+                if seek_after and seek_after[0] is None:
+                    undated = undated.filter(ChatSession.id < seek_after[1])
+                rows += undated.order_by(desc(ChatSession.id)).limit(limit + 1 - len(rows)).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             
             result = []
-            for s in sessions:
-                msg_count = db.query(func.count(Conversation.id)).filter(
-                    Conversation.session_id == s.session_id
-                ).scalar() or 0
-                
-                first_msg = db.query(Conversation.user_question).filter(
-                    Conversation.session_id == s.session_id
-                ).order_by(Conversation.timestamp).first()
-                
+            for s, msg_count, first_msg, account_id, display_name, email in rows:
                 user_name = "Anonymous"
                 user_email = None
-                if s.user_id:
-                    user = db.query(UserAccount).filter(UserAccount.id == s.user_id).first()
-                    if user:
-                        user_name = user.display_name or user.email or "User"
-                        user_email = user.email
+                if account_id is not None:
+                    user_name = display_name or email or "User"
+                    user_email = email
+                
+                first_msg = first_msg or ""
                 
                 result.append({
                     "sessionId": s.session_id,
                     "userName": user_name,
                     "userEmail": user_email,
                     "channel": s.channel or "web",
-                    "messageCount": msg_count,
-                    "firstMessage": first_msg[0][:100] + "..." if first_msg and len(first_msg[0]) > 100 else (first_msg[0] if first_msg else ""),
+                    "messageCount": msg_count or 0,
+                    "firstMessage": first_msg[:100] + "..." if len(first_msg) > 100 else first_msg,
                     "createdAt": s.created_at.isoformat() if s.created_at else None,
                     "lastActivity": s.last_activity.isoformat() if s.last_activity else None
                 })
             
             return jsonify({
                 "sessions": result,
-                "total": total,
-                "page": page,
                 "limit": limit,
-                "totalPages": (total + limit - 1) // limit
+                "hasMore": has_more,
+                "nextCursor": _encode_session_cursor(rows[-1][0]) if has_more else None
             })
     except Exception as e:
-        print(f"Admin conversations error: {e}")
+        logger.error("Admin conversations error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -964,7 +1250,9 @@ def admin_conversation_detail(session_id):
             if db is None:
                 return jsonify({"messages": [], "session": None})
             
-            session = db.query(ChatSession).filter(
+            session = db.query(ChatSession).options(
+                joinedload(ChatSession.user)
+            ).filter(
                 ChatSession.session_id == session_id
             ).first()
             
@@ -973,11 +1261,9 @@ def admin_conversation_detail(session_id):
             
             user_name = "Anonymous"
             user_email = None
-            if session.user_id:
-                user = db.query(UserAccount).filter(UserAccount.id == session.user_id).first()
-                if user:
-                    user_name = user.display_name or user.email or "User"
-                    user_email = user.email
+            if session.user:
+                user_name = session.user.display_name or session.user.email or "User"
+                user_email = session.user.email
             
             messages = db.query(Conversation).filter(
                 Conversation.session_id == session_id
@@ -1006,7 +1292,7 @@ def admin_conversation_detail(session_id):
                 "messages": message_list
             })
     except Exception as e:
-        print(f"Admin conversation detail error: {e}")
+        logger.error("Admin conversation detail error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1015,10 +1301,12 @@ def admin_conversation_detail(session_id):
 # ═══════════════════════════════════════════════════════════════════════════
 
 # Rate limiting for flag endpoint (prevent abuse)
-_flag_rate_limit = {}
 FLAG_RATE_LIMIT_WINDOW = 60  # seconds
 FLAG_RATE_LIMIT_MAX = 10  # max flags per session per minute
 
+# Fixed-window counters keyed by (session_id, window number); entries expire with their window
+_flag_rate_limit = TTLCache(maxsize=HISTORY_CACHE_MAX_SESSIONS, ttl=FLAG_RATE_LIMIT_WINDOW)
+
 @app.route("/api/conversation/flag", methods=["POST"])
 def flag_conversation():
     """Flag a specific bot response for review.
@@ -1026,7 +1314,7 @@ def flag_conversation():
     Used by end users to report issues with bot responses.
     Rate-limited to prevent abuse.
     """
-    data = request.get_json()
+    data = _read_json_body()
     session_id = data.get("session_id")
     conversation_id = data.get("conversation_id")
     reason = data.get("reason", "other")
@@ -1036,15 +1324,11 @@ def flag_conversation():
         return jsonify({"error": "Missing session_id or conversation_id"}), 400
     
     # Rate limiting
-    import time
-    current_time = time.time()
-    if session_id in _flag_rate_limit:
-        timestamps = [t for t in _flag_rate_limit[session_id] if current_time - t < FLAG_RATE_LIMIT_WINDOW]
-        if len(timestamps) >= FLAG_RATE_LIMIT_MAX:
-            return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
-        _flag_rate_limit[session_id] = timestamps + [current_time]
-    else:
-        _flag_rate_limit[session_id] = [current_time]
+    window_key = (session_id, int(time.time()) // FLAG_RATE_LIMIT_WINDOW)
+    flag_count = _flag_rate_limit.get(window_key, 0)
+    if flag_count >= FLAG_RATE_LIMIT_MAX:
+        return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
+    _flag_rate_limit[window_key] = flag_count + 1
     
     if not is_database_available():
         return jsonify({"error": "Database unavailable"}), 503
@@ -1070,10 +1354,10 @@ def flag_conversation():
             db.add(flag)
             db.commit()
             
-            print(f"[Flag] Conversation {conversation_id} flagged: {reason}", flush=True)
+            logger.info("[Flag] Conversation %s flagged: %s", conversation_id, reason)
             return jsonify({"success": True, "flag_id": flag.id})
     except Exception as e:
-        print(f"Flag conversation error: {e}")
+        logger.error("Flag conversation error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1120,39 +1404,82 @@ def admin_get_flags():
             
             return jsonify({"flags": result, "total": len(result)})
     except Exception as e:
-        print(f"Admin get flags error: {e}")
+        logger.error("Admin get flags error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+# PII patterns for export scrubbing, compiled once
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_PHONE_RE = re.compile(r'(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}')
+_NAME_RE = re.compile(r"(?:my name is|i'm|i am|call me)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=8192)
+def _sha256_prefix(value: str, length: int) -> str:
+    """First `length` hex chars of value's SHA-256; exports hash the same IDs and emails repeatedly."""
+    return hashlib.sha256(value.encode()).hexdigest()[:length]
+
+
 def _anonymize_pii(text: str) -> str:
     """Anonymize PII in text for export."""
-    import re
-    import hashlib
-    
     # Email addresses -> hashed placeholder
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = re.findall(email_pattern, text)
-    for email in emails:
-        hash_val = hashlib.sha256(email.encode()).hexdigest()[:8]
-        text = text.replace(email, f"{{{{email_{hash_val}}}}}")
+    text = _EMAIL_RE.sub(
+        lambda m: f"{{{{email_{_sha256_prefix(m.group(0), 8)}}}}}", text
+    )
     
     # Phone numbers -> placeholder
-    phone_pattern = r'(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}'
-    text = re.sub(phone_pattern, "{{phone}}", text)
+    text = _PHONE_RE.sub("{{phone}}", text)
     
-    # Names after common patterns (My name is X, I'm X, I am X)
-    name_pattern = r"(?:my name is|i'm|i am|call me)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)"
-    for match in re.finditer(name_pattern, text, re.IGNORECASE):
-        name = match.group(1)
-        text = text.replace(name, "{{user}}")
+    # Names after common patterns (My name is X, I'm X, I am X); every later
+    # mention of the name is scrubbed too, in one pass over the text
+    names = {match.group(1) for match in _NAME_RE.finditer(text)}
+    if names:
+        names_re = re.compile("|".join(re.escape(name) for name in sorted(names, key=len, reverse=True)))
+        text = names_re.sub("{{user}}", text)
     
     return text
 
 
 def _anonymize_session_id(session_id: str) -> str:
     """Hash session ID for export."""
-    import hashlib
-    return f"session_{hashlib.sha256(session_id.encode()).hexdigest()[:12]}"
+    return f"session_{_sha256_prefix(session_id, 12)}"
+
+
+def _build_export_entry(conv, flag, session_history: list) -> dict:
+    """Anonymized export record for one conversation turn and its preceding history."""
+    flag_info = None
+    if flag:
+        flag_info = {
+            "reason": flag.flag_reason,
+            "notes": _anonymize_pii(flag.flag_notes or ""),
+            "category": flag.issue_category
+        }
+    
+    # Build conversation history up to and including this turn
+    end = bisect.bisect_right(
+        session_history, (conv.timestamp, conv.id), key=lambda h: (h.timestamp, h.id)
+    )
+    history = []
+    for h in session_history[:end]:
+        history.append({
+            "role": "user",
+            "content": _anonymize_pii(h.user_question)
+        })
+        history.append({
+            "role": "assistant",
+            "content": _anonymize_pii(h.bot_answer)
+        })
+    
+    return {
+        "id": conv.id,
+        "anonymizedSessionId": _anonymize_session_id(conv.session_id),
+        "timestamp": conv.timestamp.isoformat() if conv.timestamp else None,
+        "userQuestion": _anonymize_pii(conv.user_question),
+        "botAnswer": _anonymize_pii(conv.bot_answer),
+        "safetyFlagged": conv.safety_flagged,
+        "conversationHistory": history,
+        "flagInfo": flag_info
+    }
 
 
 @app.route("/api/admin/conversations/export", methods=["GET"])
@@ -1179,100 +1506,69 @@ def admin_export_conversations():
                 return jsonify({"error": "Database session unavailable"}), 503
             
             if only_flagged:
-                # Get flagged conversations
-                flags = db.query(ConversationFlag).filter(
+                # Flagged conversations joined with their flag in one query
+                rows = db.query(Conversation, ConversationFlag).join(
+                    ConversationFlag, ConversationFlag.conversation_id == Conversation.id
+                ).filter(
                     ConversationFlag.exported == False
                 ).order_by(desc(ConversationFlag.created_at)).limit(limit).all()
-                
-                conversation_ids = [f.conversation_id for f in flags]
-                conversations = db.query(Conversation).filter(
-                    Conversation.id.in_(conversation_ids)
-                ).all()
             else:
                 # Get recent conversations
                 from datetime import timedelta
                 cutoff = datetime.utcnow() - timedelta(days=7)
-                conversations = db.query(Conversation).filter(
+                rows = [(conv, None) for conv in db.query(Conversation).filter(
                     Conversation.timestamp >= cutoff
-                ).order_by(desc(Conversation.timestamp)).limit(limit).all()
+                ).order_by(desc(Conversation.timestamp)).limit(limit).all()]
             
-            # Build export data with PII scrubbing
-            export_data = []
-            session_contexts = {}
-            
-            for conv in conversations:
-                anon_session = _anonymize_session_id(conv.session_id)
-                
-                # Get full conversation context for this session
-                if conv.session_id not in session_contexts:
-                    full_history = db.query(Conversation).filter(
-                        Conversation.session_id == conv.session_id
-                    ).order_by(Conversation.timestamp).all()
-                    session_contexts[conv.session_id] = full_history
-                
-                # Find flag info if exists
-                flag_info = None
-                if only_flagged:
-                    flag = db.query(ConversationFlag).filter(
-                        ConversationFlag.conversation_id == conv.id
-                    ).first()
-                    if flag:
-                        flag_info = {
-                            "reason": flag.flag_reason,
-                            "notes": _anonymize_pii(flag.flag_notes or ""),
-                            "category": flag.issue_category
-                        }
-                        # Mark as exported
-                        flag.exported = True
-                
-                # Build conversation history up to this point
-                history = []
-                for h in session_contexts[conv.session_id]:
-                    if h.timestamp <= conv.timestamp:
-                        history.append({
-                            "role": "user",
-                            "content": _anonymize_pii(h.user_question)
-                        })
-                        history.append({
-                            "role": "assistant",
-                            "content": _anonymize_pii(h.bot_answer)
-                        })
-                    if h.id == conv.id:
-                        break
-                
-                export_data.append({
-                    "id": conv.id,
-                    "anonymizedSessionId": anon_session,
-                    "timestamp": conv.timestamp.isoformat() if conv.timestamp else None,
-                    "userQuestion": _anonymize_pii(conv.user_question),
-                    "botAnswer": _anonymize_pii(conv.bot_answer),
-                    "safetyFlagged": conv.safety_flagged,
-                    "conversationHistory": history,
-                    "flagInfo": flag_info
-                })
+            # Prefetch every involved session's history in one query, in timestamp order
+            session_contexts = defaultdict(list)
+            session_ids = {conv.session_id for conv, _ in rows}
+            if session_ids:
+                for h in db.query(Conversation).filter(
+                    Conversation.session_id.in_(session_ids)
+                ).order_by(Conversation.session_id, Conversation.timestamp, Conversation.id):
+                    session_contexts[h.session_id].append(h)
             
-            if only_flagged:
-                db.commit()  # Save exported=True flags
+            if only_flagged and rows:
+                # Mark every exported flag in a single Core UPDATE (no ORM session sync)
+                flag_ids = [flag.id for _, flag in rows]
+                db.execute(
+                    update(ConversationFlag)
+                    .where(ConversationFlag.id.in_(flag_ids))
+                    .values(exported=True)
+                    .execution_options(synchronize_session=False)
+                )
             
-            # Log export
-            print(f"[Export] Exported {len(export_data)} conversations", flush=True)
+            # Detach the loaded rows so they stay readable after the session closes
+            # and the response body is generated
+            db.expunge_all()
+        
+        exported_at = datetime.utcnow().isoformat()
+        
+        def generate():
+            # Scrub and serialize one conversation at a time instead of holding the
+            # whole export as dicts plus one big encoded string
+            yield b'{"exportedAt":' + orjson.dumps(exported_at) + b',"count":' + str(len(rows)).encode() + b',"conversations":['
+            for i, (conv, flag) in enumerate(rows):
+                if i:
+                    yield b","
+                yield orjson.dumps(_build_export_entry(conv, flag, session_contexts[conv.session_id]))
+            yield b"]}"
             
-            return jsonify({
-                "exportedAt": datetime.utcnow().isoformat(),
-                "count": len(export_data),
-                "conversations": export_data
-            })
+            logger.info("[Export] Exported %s conversations", len(rows))
+        
+        return Response(stream_with_context(generate()), mimetype="application/json")
     except Exception as e:
-        print(f"Admin export error: {e}")
+        logger.error("Admin export error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/transcribe", methods=["POST"])
 def transcribe_audio():
     """Transcribe audio/video file using OpenAI Whisper API."""
+    import glob
     import tempfile
     import subprocess
-    import math
     from openai import OpenAI
     
     if not validate_internal_api_key():
@@ -1308,7 +1604,7 @@ def transcribe_audio():
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
             
             if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
+                logger.error("FFmpeg error: %s", result.stderr)
                 return jsonify({"error": f"Failed to extract audio: {result.stderr[:200]}"}), 500
             
             if not os.path.exists(audio_path):
@@ -1324,48 +1620,45 @@ def transcribe_audio():
                     ]
                     result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
                     if result.returncode != 0:
-                        print(f"FFprobe error: {result.stderr}")
+                        logger.error("FFprobe error: %s", result.stderr)
                         return 0
                     return float(result.stdout.strip())
                 except Exception as e:
-                    print(f"Duration detection error: {e}")
+                    logger.error("Duration detection error: %s", e)
                     return 0
             
             duration = get_audio_duration(audio_path)
             chunk_duration = 600
-            num_chunks = max(1, math.ceil(duration / chunk_duration))
             
-            if num_chunks == 1:
-                chunks = [audio_path]
-            else:
-                chunks = []
-                for i in range(num_chunks):
-                    start_time = i * chunk_duration
-                    chunk_path = os.path.join(temp_dir, f"chunk_{i:03d}.mp3")
-                    cmd = [
-                        "ffmpeg", "-i", audio_path,
-                        "-ss", str(start_time),
-                        "-t", str(chunk_duration),
-                        "-acodec", "libmp3lame", "-ab", "64k", "-ar", "16000",
-                        "-y", chunk_path
-                    ]
-                    chunk_result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                    if chunk_result.returncode != 0:
-                        print(f"Chunk {i} ffmpeg error: {chunk_result.stderr}")
-                    if os.path.exists(chunk_path):
-                        chunks.append(chunk_path)
+            # Split the encoded MP3 into 10-minute pieces in one stream-copy pass
+            # (no re-encode); a short file simply yields a single segment
+            cmd = [
+                "ffmpeg", "-i", audio_path,
+                "-f", "segment", "-segment_time", str(chunk_duration),
+                "-c", "copy", "-reset_timestamps", "1",
+                "-y", os.path.join(temp_dir, "chunk_%03d.mp3")
+            ]
+            segment_result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            if segment_result.returncode != 0:
+                # Segments a failed run left behind would give a truncated transcript
+                logger.error("Segment ffmpeg error: %s", segment_result.stderr)
+                return jsonify({"error": f"Failed to split audio: {segment_result.stderr[:200]}"}), 500
+            chunks = sorted(glob.glob(os.path.join(temp_dir, "chunk_*.mp3"))) or [audio_path]
             
             client = OpenAI(api_key=api_key)
-            all_transcripts = []
             
-            for chunk_path in chunks:
+            def transcribe_chunk(chunk_path):
                 with open(chunk_path, "rb") as audio_file:
-                    transcript = client.audio.transcriptions.create(
+                    return client.audio.transcriptions.create(
                         model="whisper-1",
                         file=audio_file,
                         response_format="text"
                     )
-                    all_transcripts.append(transcript)
+            
+            # Chunks are independent, so the Whisper calls run concurrently;
+            # map() keeps results in chunk order
+            with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as chunk_executor:
+                all_transcripts = list(chunk_executor.map(transcribe_chunk, chunks))
             
             full_transcript = "\n\n".join(all_transcripts)
             
@@ -1382,11 +1675,28 @@ def transcribe_audio():
             })
     
     except Exception as e:
-        print(f"Transcription error: {e}")
+        logger.error("Transcription error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
-vapi_conversation_histories = {}
+# Per-call histories; calls that never send an end-of-call report age out instead of leaking
+VOICE_HISTORY_CACHE_MAX_CALLS = 10000
+VOICE_HISTORY_CACHE_TTL_SECONDS = 3600
+
+vapi_conversation_histories = TTLCache(maxsize=VOICE_HISTORY_CACHE_MAX_CALLS, ttl=VOICE_HISTORY_CACHE_TTL_SECONDS)
+
+# Pre-encoded bodies for the VAPI endpoints' most frequent replies
+_EMPTY_JSON = b"{}"
+_UNAUTHORIZED_JSON = b'{"error":"Unauthorized"}'
+
+
+def _json_ack(body: bytes = _EMPTY_JSON, status: int = 200) -> Response:
+    """Response around a pre-encoded JSON body, skipping jsonify's encode step.
+    
+    A fresh Response each time: after_request hooks (CORS) mutate its headers,
+    so a single shared instance is not safe to hand out.
+    """
+    return Response(body, status=status, mimetype="application/json")
 
 
 def validate_vapi_request() -> bool:
@@ -1396,18 +1706,16 @@ def validate_vapi_request() -> bool:
     Checks for VAPI secret in Authorization header or x-vapi-secret header.
     If VAPI_WEBHOOK_SECRET is not configured, allows all requests (dev mode).
     """
-    vapi_secret = os.environ.get("VAPI_WEBHOOK_SECRET", "")
-    
-    if not vapi_secret:
+    if not VAPI_WEBHOOK_SECRET:
         return True
     
     auth_header = request.headers.get("Authorization", "")
     if auth_header.startswith("Bearer "):
-        if auth_header[7:] == vapi_secret:
+        if hmac.compare_digest(auth_header[7:].encode(), VAPI_WEBHOOK_SECRET):
             return True
     
     vapi_header = request.headers.get("x-vapi-secret", "")
-    if vapi_header == vapi_secret:
+    if vapi_header and hmac.compare_digest(vapi_header.encode(), VAPI_WEBHOOK_SECRET):
         return True
     
     return False
@@ -1428,11 +1736,11 @@ def vapi_webhook():
     Security: Validates VAPI_WEBHOOK_SECRET if configured.
     """
     if not validate_vapi_request():
-        print(f"[VAPI] Rejected request - invalid or missing authentication")
-        return jsonify({"error": "Unauthorized"}), 401
+        logger.warning("[VAPI] Rejected request - invalid or missing authentication")
+        return _json_ack(_UNAUTHORIZED_JSON, 401)
     
     try:
-        data = request.get_json()
+        data = _read_json_body()
         if not data or "message" not in data:
             return jsonify({"error": "Invalid request format"}), 400
         
@@ -1440,7 +1748,7 @@ def vapi_webhook():
         message_type = message.get("type", "")
         call_id = message.get("call", {}).get("id", "unknown")
         
-        print(f"[VAPI] Received {message_type} for call {call_id}")
+        logger.debug("[VAPI] Received %s for call %s", message_type, call_id)
         
         if message_type == "tool-calls":
             return handle_vapi_tool_calls(message, call_id)
@@ -1456,21 +1764,21 @@ def vapi_webhook():
         
         elif message_type == "status-update":
             status = message.get("status", "")
-            print(f"[VAPI] Call {call_id} status: {status}")
-            return jsonify({}), 200
+            logger.info("[VAPI] Call %s status: %s", call_id, status)
+            return _json_ack()
         
         elif message_type == "transcript":
             transcript = message.get("transcript", "")
             role = message.get("role", "")
-            print(f"[VAPI] Transcript ({role}): {transcript[:100]}...")
-            return jsonify({}), 200
+            logger.debug("[VAPI] Transcript (%s): %s...", role, transcript[:100])
+            return _json_ack()
         
         else:
-            print(f"[VAPI] Unhandled message type: {message_type}")
-            return jsonify({}), 200
+            logger.warning("[VAPI] Unhandled message type: %s", message_type)
+            return _json_ack()
             
     except Exception as e:
-        print(f"[VAPI] Webhook error: {e}")
+        logger.error("[VAPI] Webhook error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1501,7 +1809,7 @@ def handle_vapi_tool_calls(message: dict, call_id: str):
         tool_name = tool_call.get("name", "")
         params = tool_call.get("parameters", {})
         
-        print(f"[VAPI] Tool call: {tool_name} with params: {params}")
+        logger.debug("[VAPI] Tool call: %s with params: %s", tool_name, params)
         
         if tool_name == "get_somera_response":
             user_message = params.get("user_message", params.get("message", ""))
@@ -1513,12 +1821,12 @@ def handle_vapi_tool_calls(message: dict, call_id: str):
                 })
                 continue
             
-            history = vapi_conversation_histories.get(call_id, [])
+            history = vapi_conversation_histories.setdefault(call_id, deque(maxlen=VOICE_HISTORY_MAXLEN))
             
             try:
                 response_data = generate_somera_response(
                     user_message=user_message,
-                    conversation_history=history,
+                    conversation_history=list(history),
                     delivery_mode="voice"
                 )
                 response_text = response_data.get("response", "I'm here to listen. Could you tell me more?")
@@ -1526,9 +1834,8 @@ def handle_vapi_tool_calls(message: dict, call_id: str):
                 
                 history.append({"role": "user", "content": user_message})
                 history.append({"role": "assistant", "content": response_text})
-                vapi_conversation_histories[call_id] = history[-20:]
                 
-                print(f"[VAPI] ANNA response (voice mode): {response_text[:100]}...")
+                logger.debug("[VAPI] ANNA response (voice mode): %s...", response_text[:100])
                 
                 results.append({
                     "toolCallId": tool_call_id,
@@ -1537,7 +1844,7 @@ def handle_vapi_tool_calls(message: dict, call_id: str):
                 })
                 
             except Exception as e:
-                print(f"[VAPI] ANNA error: {e}")
+                logger.error("[VAPI] ANNA error: %s", e)
                 results.append({
                     "toolCallId": tool_call_id,
                     "result": "I'm having a moment. Could you share that with me again?"
@@ -1556,9 +1863,9 @@ def handle_vapi_conversation_update(message: dict, call_id: str):
     """Track conversation updates from VAPI."""
     messages = message.get("messagesOpenAIFormatted", [])
     if messages:
-        vapi_conversation_histories[call_id] = messages[-20:]
-        print(f"[VAPI] Updated conversation history for call {call_id}: {len(messages)} messages")
-    return jsonify({}), 200
+        vapi_conversation_histories[call_id] = deque(messages[-VOICE_HISTORY_MAXLEN:], maxlen=VOICE_HISTORY_MAXLEN)
+        logger.debug("[VAPI] Updated conversation history for call %s: %s messages", call_id, len(messages))
+    return _json_ack()
 
 
 def handle_vapi_end_of_call(message: dict, call_id: str):
@@ -1568,33 +1875,76 @@ def handle_vapi_end_of_call(message: dict, call_id: str):
     transcript = artifact.get("transcript", "")
     duration = message.get("call", {}).get("duration", 0)
     
-    print(f"[VAPI] Call {call_id} ended. Reason: {ended_reason}, Duration: {duration}s")
-    print(f"[VAPI] Transcript preview: {transcript[:200]}...")
-    
-    if call_id in vapi_conversation_histories:
-        del vapi_conversation_histories[call_id]
-    
-    return jsonify({}), 200
+    logger.info("[VAPI] Call %s ended. Reason: %s, Duration: %ss", call_id, ended_reason, duration)
+    logger.debug("[VAPI] Transcript preview: %s...", transcript[:200])
+    
+    flush_voice_messages(call_id)
+    vapi_conversation_histories.pop(call_id, None)
+    custom_llm_conversation_histories.pop(call_id, None)
+    voice_call_turn_counts.pop(call_id, None)
+    
+    return _json_ack()
+
+
+END_CALL_PHRASES = (
+    "goodbye", "bye", "bye bye", "bye-bye",
+    "thank you bye", "thanks bye", "thank you goodbye",
+    "that's all", "that is all", "that will be all",
+    "end call", "end the call", "hang up",
+    "no thank you", "no thanks", "no that's it",
+    "have a nice day", "have a good day", "have a great day",
+    "take care", "see you", "see you later",
+    "I'm done", "I am done", "we're done", "we are done",
+    "nothing else", "nothing more", "that's everything",
+    "I'll let you go", "let me go", "I should go",
+    "I have to go", "I need to go", "gotta go"
+)
+
+# One alternation, longest phrases first, so a transcript is scanned once
+# instead of once per phrase
+_END_CALL_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(p) for p in sorted(END_CALL_PHRASES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
 
 
-def handle_vapi_assistant_request(message: dict, call_id: str):
-    """
-    Handle dynamic assistant configuration request.
+def transcript_requests_end(text: str) -> bool:
+    """Check whether a transcript contains any of the end-call phrases."""
+    return _END_CALL_RE.search(text) is not None
+
+
+# Words that can surround a goodbye without adding anything to respond to
+_END_CALL_FILLERS = ("ok", "okay", "alright", "all right", "well", "so", "yes", "yeah", "then", "now", "for now", "thanks", "thank you", "so much", "again", "very much")
+_END_CALL_WORD_RE = re.compile(r"[\w']+")
+_END_CALL_ONLY_PHRASES = frozenset(
+    tuple(_END_CALL_WORD_RE.findall(p.lower())) for p in END_CALL_PHRASES + _END_CALL_FILLERS
+)
+_END_CALL_ONLY_MAX_WORDS = max(len(p) for p in _END_CALL_ONLY_PHRASES)
+END_CALL_CLOSING_MESSAGE = "Thank you for sharing with me today. Take gentle care of yourself."
+
+
+def is_end_call_utterance(text: str) -> bool:
+    """True when an utterance is only a goodbye, e.g. "okay, thanks, bye!".
     
-    This is called when VAPI needs to know which assistant to use.
-    We return a transient assistant configuration with ANNA's persona.
+    Walks the words once, tracking which positions a run of goodbye and
+    filler phrases can reach, so the cost stays linear in the utterance.
     """
-    elevenlabs_voice_id = os.environ.get("ELEVENLABS_VOICE_ID", "")
-    
-    webhook_base = os.environ.get("WEBHOOK_BASE_URL", "")
-    if not webhook_base:
-        replit_domain = os.environ.get("REPLIT_DEV_DOMAIN", "")
-        if replit_domain:
-            webhook_base = f"https://{replit_domain}"
-    
-    webhook_url = f"{webhook_base}/api/vapi/webhook"
-    
-    assistant_config = {
+    if not transcript_requests_end(text):
+        return False
+    words = _END_CALL_WORD_RE.findall(text.lower())
+    reachable = [True] + [False] * len(words)
+    for start in range(len(words)):
+        if not reachable[start]:
+            continue
+        for end in range(start + 1, min(start + _END_CALL_ONLY_MAX_WORDS, len(words)) + 1):
+            if tuple(words[start:end]) in _END_CALL_ONLY_PHRASES:
+                reachable[end] = True
+    return reachable[-1]
+
+
+def build_assistant_config(elevenlabs_voice_id: str, webhook_url: str) -> dict:
+    """Build ANNA's transient assistant config; only the voice and URL vary."""
+    return {
         "assistant": {
             "name": "ANNA Voice",
             "firstMessage": "Hello, this is Somera. I'm here to listen and support you. What's on your mind today?",
@@ -1604,7 +1954,7 @@ def handle_vapi_assistant_request(message: dict, call_id: str):
                 "messages": [
                     {
                         "role": "system",
-                        "content": get_somera_voice_system_prompt()
+                        "content": SOMERA_VOICE_SYSTEM_PROMPT
                     }
                 ],
                 "tools": [
@@ -1649,29 +1999,39 @@ def handle_vapi_assistant_request(message: dict, call_id: str):
             "silenceTimeoutSeconds": 30,
             "responseDelaySeconds": 0.4,
             "endCallMessage": "Thank you for sharing with me today. Take care of yourself, and remember, you're not alone on this journey.",
-            "endCallPhrases": [
-                "goodbye", "bye", "bye bye", "bye-bye",
-                "thank you bye", "thanks bye", "thank you goodbye",
-                "that's all", "that is all", "that will be all",
-                "end call", "end the call", "hang up",
-                "no thank you", "no thanks", "no that's it",
-                "have a nice day", "have a good day", "have a great day",
-                "take care", "see you", "see you later",
-                "I'm done", "I am done", "we're done", "we are done",
-                "nothing else", "nothing more", "that's everything",
-                "I'll let you go", "let me go", "I should go",
-                "I have to go", "I need to go", "gotta go"
-            ]
+            "endCallPhrases": list(END_CALL_PHRASES)
         }
     }
+
+
+@lru_cache(maxsize=4)
+def assistant_config_json(elevenlabs_voice_id: str, webhook_url: str) -> bytes:
+    """Serialized assistant config, rendered once per voice/URL pair."""
+    return orjson.dumps(build_assistant_config(elevenlabs_voice_id, webhook_url))
+
+
+def handle_vapi_assistant_request(message: dict, call_id: str):
+    """
+    Handle dynamic assistant configuration request.
+    
+    This is called when VAPI needs to know which assistant to use.
+    We return a transient assistant configuration with ANNA's persona.
+    """
+    elevenlabs_voice_id = os.environ.get("ELEVENLABS_VOICE_ID", "")
     
-    print(f"[VAPI] Returning assistant config for call {call_id}")
-    return jsonify(assistant_config), 200
+    webhook_base = os.environ.get("WEBHOOK_BASE_URL", "")
+    if not webhook_base:
+        replit_domain = os.environ.get("REPLIT_DEV_DOMAIN", "")
+        if replit_domain:
+            webhook_base = f"https://{replit_domain}"
+    
+    webhook_url = f"{webhook_base}/api/vapi/webhook"
+    
+    logger.debug("[VAPI] Returning assistant config for call %s", call_id)
+    return _json_ack(assistant_config_json(elevenlabs_voice_id, webhook_url))
 
 
-def get_somera_voice_system_prompt() -> str:
-    """Get the system prompt optimized for voice interactions."""
-    return """You are ANNA, Anna's empathetic AI coaching assistant for Anna Kitney, speaking with someone on a phone call.
+SOMERA_VOICE_SYSTEM_PROMPT = """You are ANNA, Anna's empathetic AI coaching assistant for Anna Kitney, speaking with someone on a phone call.
 
 YOUR VOICE PERSONA:
 - Warm, calm, and genuinely caring - like a trusted friend who truly sees them
@@ -1738,6 +2098,26 @@ IMPORTANT:
 - Never say "as an AI" or break character"""
 
 
+def get_somera_voice_system_prompt() -> str:
+    """Get the system prompt optimized for voice interactions."""
+    return SOMERA_VOICE_SYSTEM_PROMPT
+
+
+VOICE_MAX_SENTENCES = 4
+
+_MD_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_MD_ITALIC_RE = re.compile(r'\*([^*]+)\*')
+_MD_UNDERLINE_BOLD_RE = re.compile(r'__([^_]+)__')
+_MD_UNDERLINE_ITALIC_RE = re.compile(r'_([^_]+)_')
+_MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+_URL_RE = re.compile(r'https?://\S+')
+_LIST_BULLET_RE = re.compile(r'^\s*[-*•]\s*', re.MULTILINE)
+_LIST_NUMBER_RE = re.compile(r'^\s*\d+\.\s*', re.MULTILINE)
+_NON_SPEECH_RE = re.compile(r'[^\w\s.,!?\'"-]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_EMOJI_TABLE = str.maketrans('', '', '💙❤✨🌟\ufe0f')
+
+
 def optimize_response_for_voice(text: str) -> str:
     """
     Optimize text response for voice/TTS output.
@@ -1747,144 +2127,278 @@ def optimize_response_for_voice(text: str) -> str:
     - Remove URLs (can't speak them naturally)
     - Add natural pauses
     """
-    import re
-    
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'__([^_]+)__', r'\1', text)
-    text = re.sub(r'_([^_]+)_', r'\1', text)
+    text = _MD_BOLD_RE.sub(r'\1', text)
+    text = _MD_ITALIC_RE.sub(r'\1', text)
+    text = _MD_UNDERLINE_BOLD_RE.sub(r'\1', text)
+    text = _MD_UNDERLINE_ITALIC_RE.sub(r'\1', text)
     
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    text = _MD_LINK_RE.sub(r'\1', text)
     
-    text = re.sub(r'https?://[^\s]+', '', text)
+    text = _URL_RE.sub('', text)
     
-    text = re.sub(r'^\s*[-*•]\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s*', '', text, flags=re.MULTILINE)
+    text = _LIST_BULLET_RE.sub('', text)
+    text = _LIST_NUMBER_RE.sub('', text)
     
-    text = text.replace('💙', '').replace('❤️', '').replace('✨', '').replace('🌟', '')
-    text = re.sub(r'[^\w\s.,!?\'"-]', '', text)
+    text = text.translate(_EMOJI_TABLE)
+    text = _NON_SPEECH_RE.sub('', text)
     
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     
-    sentences = text.split('. ')
-    if len(sentences) > 4:
-        text = '. '.join(sentences[:4]) + '.'
+    sentences = text.split('. ', VOICE_MAX_SENTENCES)
+    if len(sentences) > VOICE_MAX_SENTENCES:
+        text = '. '.join(sentences[:VOICE_MAX_SENTENCES]) + '.'
     
     return text
 
 
-custom_llm_conversation_histories = {}
-voice_call_turn_counts = {}
+_VOICE_TOKEN_SPLIT_RE = re.compile(r'(\s+)')
+_VOICE_LINK_TARGET_RE = re.compile(r'\]\([^)]*\)?')
+_VOICE_LIST_MARKER_RE = re.compile(r'^(?:[-*•]|\d+\.)$')
+_VOICE_NON_SPEECH_RE = re.compile(r'[^\w\s.,!?\'"-]|_')
+
+
+def _clean_voice_word(word: str) -> str:
+    """Strip markdown, link targets and non-speech characters from one word."""
+    if word.startswith(("http://", "https://")):
+        return ""
+    return _VOICE_NON_SPEECH_RE.sub('', _VOICE_LINK_TARGET_RE.sub('', word))
+
+
+def voice_token_filter(token_iter):
+    """
+    Incremental counterpart of optimize_response_for_voice for streamed tokens.
+    
+    Tokens are held only until the word they belong to is complete, so
+    emphasis markers, URLs and list bullets are dropped without waiting for
+    the whole response. Stops after VOICE_MAX_SENTENCES sentences, closing
+    token_iter so the upstream LLM stream is released rather than left open.
+    """
+    pending = ""
+    line_start = True
+    spoke = False
+    sentences = 0
+    
+    def words(parts):
+        # parts alternates word, separator, word, separator, ...
+        nonlocal line_start, spoke, sentences
+        for word, separator in zip(parts[::2], parts[1::2]):
+            if word and not (line_start and _VOICE_LIST_MARKER_RE.match(word)):
+                cleaned = _clean_voice_word(word)
+                if cleaned:
+                    if cleaned[-1] in ".!?":
+                        sentences += 1
+                    yield (" " + cleaned) if spoke else cleaned
+                    spoke = True
+            line_start = "\n" in separator or (line_start and not word)
+    
+    try:
+        for token in token_iter:
+            pending += token
+            parts = _VOICE_TOKEN_SPLIT_RE.split(pending)
+            pending = parts.pop()
+            for piece in words(parts):
+                yield piece
+                if sentences >= VOICE_MAX_SENTENCES:
+                    return
+        
+        yield from words([pending, ""])
+    finally:
+        close = getattr(token_iter, "close", None)
+        if close is not None:
+            close()
+
+
+custom_llm_conversation_histories = TTLCache(maxsize=VOICE_HISTORY_CACHE_MAX_CALLS, ttl=VOICE_HISTORY_CACHE_TTL_SECONDS)
+voice_call_turn_counts = TTLCache(maxsize=VOICE_HISTORY_CACHE_MAX_CALLS, ttl=VOICE_HISTORY_CACHE_TTL_SECONDS)
 
 # CRITICAL: Graceful error message for VAPI when backend fails
 # This ensures ANNA speaks an error message instead of VAPI falling back to GPT
 ANNA_ERROR_MESSAGE = "I'm sorry, I'm experiencing some technical difficulties right now. Please try again in a moment, or reach out to our team directly for support."
 
 
-def log_backend_error(error_type: str, endpoint: str, error_message: str, request_data: str = None, call_id: str = None):
-    """Log backend errors to database for monitoring and alerting.
+# Voice messages and backend error logs are written by one long-lived worker
+# draining _db_write_queue, so callers only pay for a queue put.
+DB_WRITE_QUEUE_MAXSIZE = 10000
+DB_WRITE_BATCH_SIZE = 32
+_db_write_queue = queue.Queue(maxsize=DB_WRITE_QUEUE_MAXSIZE)
+
+
+def _write_backend_errors(entries: list):
+    """Insert backend_error_logs rows in one statement, falling back to logs/backend_errors.log.
     
-    Falls back to file logging if database is unavailable to ensure
-    no error evidence is lost during outages.
+    Each entry is (error_type, endpoint, error_message, request_data, call_id).
     """
-    import threading
-    import datetime
+    db_logged = False
+    try:
+        with get_raw_connection() as conn:
+            if conn is not None:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        INSERT INTO backend_error_logs (error_type, endpoint, error_message, request_data, call_id)
+                        VALUES %s
+                    """, entries)
+        db_logged = conn is not None
+        
+        if db_logged:
+            for error_type, _, error_message, _, call_id in entries:
+                logger.info("[ERROR LOG] Logged %s error for call %s: %s", error_type, call_id, error_message[:100])
+            
+    except Exception as db_error:
+        logger.error("[ERROR LOG] Database logging failed: %s", db_error)
     
-    def _log():
-        db_logged = False
+    # Fallback: Always log to file as backup
+    if not db_logged:
         try:
-            import psycopg2
-            database_url = os.environ.get("DATABASE_URL")
-            if database_url:
-                conn = psycopg2.connect(database_url)
-                cur = conn.cursor()
-                
-                cur.execute("""
-                    INSERT INTO backend_error_logs (error_type, endpoint, error_message, request_data, call_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (error_type, endpoint, error_message, request_data, call_id))
-                
-                conn.commit()
-                cur.close()
-                conn.close()
-                db_logged = True
-                
-                print(f"[ERROR LOG] Logged {error_type} error for call {call_id}: {error_message[:100]}")
-                
-        except Exception as db_error:
-            print(f"[ERROR LOG] Database logging failed: {db_error}")
-        
-        # Fallback: Always log to file as backup
-        if not db_logged:
-            try:
-                os.makedirs("logs", exist_ok=True)
-                timestamp = datetime.datetime.now().isoformat()
-                with open("logs/backend_errors.log", "a") as f:
+            os.makedirs("logs", exist_ok=True)
+            timestamp = datetime.now().isoformat()
+            with open("logs/backend_errors.log", "a") as f:
+                for error_type, endpoint, error_message, request_data, call_id in entries:
                     f.write(f"\n[{timestamp}] {error_type} | {endpoint} | call_id={call_id}\n")
                     f.write(f"Error: {error_message}\n")
                     if request_data:
                         f.write(f"Request: {request_data[:500]}\n")
                     f.write("-" * 50 + "\n")
-                print(f"[ERROR LOG] Fallback file logging completed for {error_type}")
-            except Exception as file_error:
-                print(f"[ERROR LOG] CRITICAL - Both DB and file logging failed: {file_error}")
+            logger.debug("[ERROR LOG] Fallback file logging completed for %s errors", len(entries))
+        except Exception as file_error:
+            logger.critical("[ERROR LOG] CRITICAL - Both DB and file logging failed: %s", file_error)
+
+
+def log_backend_error(error_type: str, endpoint: str, error_message: str, request_data: str = None, call_id: str = None):
+    """Log backend errors to database for monitoring and alerting.
     
-    thread = threading.Thread(target=_log, daemon=True)
-    thread.start()
+    Falls back to file logging if database is unavailable to ensure
+    no error evidence is lost during outages.
+    """
+    args = (error_type, endpoint, error_message, request_data, call_id)
+    try:
+        _db_write_queue.put_nowait(("error", args))
+    except queue.Full:
+        _write_backend_errors([args])
 
 
-def save_voice_message_async(call_id: str, role: str, content: str, readiness_score: float = None, readiness_recommendation: str = None, latency_ms: int = None, closure_type: str = None, sources: list = None):
-    """Save a voice message to the database in a background thread (non-blocking for latency)."""
-    import threading
-    import json
+# Voice turns are buffered per call and handed to the writer as one multi-row
+# INSERT once a call has VOICE_MESSAGE_BATCH_SIZE pending rows,
+# VOICE_MESSAGE_FLUSH_SECONDS after its first pending row, or when the call ends.
+VOICE_MESSAGE_BATCH_SIZE = 8
+VOICE_MESSAGE_FLUSH_SECONDS = 2
+_voice_message_buffer = defaultdict(list)
+_voice_message_lock = threading.Lock()
+
+# Calls whose voice_conversations row is known to exist; only written by the DB writer
+_voice_conversations_started = TTLCache(maxsize=VOICE_HISTORY_CACHE_MAX_CALLS, ttl=VOICE_HISTORY_CACHE_TTL_SECONDS)
+
+
+def _write_voice_messages(rows: list):
+    """Insert buffered voice_messages rows, creating conversations for new calls first."""
+    new_call_ids = sorted({row[0] for row in rows if row[0] not in _voice_conversations_started})
+    with get_raw_connection() as conn:
+        if conn is None:
+            logger.error("[Voice DB Async] Database unavailable, dropped %s messages", len(rows))
+            return
+        
+        with conn.cursor() as cur:
+            if new_call_ids:
+                execute_values(cur, """
+                    INSERT INTO voice_conversations (call_id, started_at)
+                    VALUES %s
+                    ON CONFLICT (call_id) DO NOTHING
+                """, [(call_id,) for call_id in new_call_ids], template="(%s, CURRENT_TIMESTAMP)")
+            
+            execute_values(cur, """
+                INSERT INTO voice_messages (call_id, turn_number, role, content, readiness_score, readiness_recommendation, latency_ms, closure_type, sources, timestamp)
+                VALUES %s
+            """, rows)
+    
+    for call_id in new_call_ids:
+        _voice_conversations_started[call_id] = True
+
+
+def _write_db_batch(batch: list):
+    """Write one drained batch: one INSERT for the voice rows, one for the error logs."""
+    voice_rows = [row for kind, payload in batch if kind == "voice" for row in payload]
+    if voice_rows:
+        try:
+            _write_voice_messages(voice_rows)
+            logger.debug("[Voice DB Async] Wrote %s messages", len(voice_rows))
+        except Exception as e:
+            logger.error("[Voice DB Async] Error: %s", e)
+    
+    error_entries = [payload for kind, payload in batch if kind == "error"]
+    if error_entries:
+        _write_backend_errors(error_entries)
+
+
+def _db_write_worker():
+    """Drain _db_write_queue forever, up to DB_WRITE_BATCH_SIZE items per write."""
+    while True:
+        batch = [_db_write_queue.get()]
+        try:
+            while len(batch) < DB_WRITE_BATCH_SIZE:
+                batch.append(_db_write_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        try:
+            _write_db_batch(batch)
+        except Exception as e:
+            logger.error("[DB Writer] Batch failed: %s", e)
+        finally:
+            for _ in batch:
+                _db_write_queue.task_done()
+
+
+def flush_voice_messages(call_id: str):
+    """Hand any buffered messages for a call to the writer."""
+    with _voice_message_lock:
+        rows = _voice_message_buffer.pop(call_id, None)
+    if not rows:
+        return
     
+    try:
+        _db_write_queue.put_nowait(("voice", rows))
+    except queue.Full:
+        logger.error("[Voice DB Async] Write queue full, dropped %s messages for call %s", len(rows), call_id)
+
+
+def _drain_db_writes():
+    """Hand every buffered call to the writer and wait for it at shutdown."""
+    with _voice_message_lock:
+        call_ids = list(_voice_message_buffer)
+    for call_id in call_ids:
+        flush_voice_messages(call_id)
+    _db_write_queue.join()
+
+
+threading.Thread(target=_db_write_worker, name="db-writer", daemon=True).start()
+atexit.register(_drain_db_writes)
+
+
+def save_voice_message_async(call_id: str, role: str, content: str, readiness_score: float = None, readiness_recommendation: str = None, latency_ms: int = None, closure_type: str = None, sources: list = None):
+    """Queue a voice message for a batched background write (non-blocking for latency)."""
     turn_number = voice_call_turn_counts.get(call_id, 0)
     if role == "user":
         turn_number += 1
         voice_call_turn_counts[call_id] = turn_number
     
     sources_json = json.dumps(sources) if sources else None
+    row = (call_id, turn_number, role, content, readiness_score, readiness_recommendation, latency_ms, closure_type, sources_json, datetime.now(timezone.utc))
     
-    def _save():
-        try:
-            import psycopg2
-            database_url = os.environ.get("DATABASE_URL")
-            if not database_url:
-                return
-            
-            conn = psycopg2.connect(database_url)
-            cur = conn.cursor()
-            
-            cur.execute("""
-                INSERT INTO voice_conversations (call_id, started_at)
-                VALUES (%s, CURRENT_TIMESTAMP)
-                ON CONFLICT (call_id) DO NOTHING
-            """, (call_id,))
-            
-            cur.execute("""
-                INSERT INTO voice_messages (call_id, turn_number, role, content, readiness_score, readiness_recommendation, latency_ms, closure_type, sources, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-            """, (call_id, turn_number, role, content, readiness_score, readiness_recommendation, latency_ms, closure_type, sources_json))
-            
-            conn.commit()
-            cur.close()
-            conn.close()
-            
-        except Exception as e:
-            print(f"[Voice DB Async] Error: {e}")
+    with _voice_message_lock:
+        pending = _voice_message_buffer[call_id]
+        pending.append(row)
+        pending_count = len(pending)
     
-    thread = threading.Thread(target=_save, daemon=True)
-    thread.start()
+    if pending_count >= VOICE_MESSAGE_BATCH_SIZE:
+        flush_voice_messages(call_id)
+    elif pending_count == 1:
+        gevent.spawn_later(VOICE_MESSAGE_FLUSH_SECONDS, flush_voice_messages, call_id)
 
 
 def save_voice_message_to_db(call_id: str, role: str, content: str, readiness_score: float = None, readiness_recommendation: str = None):
     """Save a voice conversation message to the database."""
     try:
-        import psycopg2
-        database_url = os.environ.get("DATABASE_URL")
-        if not database_url:
-            print("[Voice DB] DATABASE_URL not found, skipping save")
+        if not is_database_available():
+            logger.warning("[Voice DB] DATABASE_URL not found, skipping save")
             return
         
         turn_number = voice_call_turn_counts.get(call_id, 0)
@@ -1892,52 +2406,38 @@ def save_voice_message_to_db(call_id: str, role: str, content: str, readiness_sc
             turn_number += 1
             voice_call_turn_counts[call_id] = turn_number
         
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            INSERT INTO voice_messages (call_id, turn_number, role, content, readiness_score, readiness_recommendation)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (call_id, turn_number, role, content, readiness_score, readiness_recommendation))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_raw_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO voice_messages (call_id, turn_number, role, content, readiness_score, readiness_recommendation)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (call_id, turn_number, role, content, readiness_score, readiness_recommendation))
         
-        print(f"[Voice DB] Saved {role} message for call {call_id}, turn {turn_number}")
+        logger.debug("[Voice DB] Saved %s message for call %s, turn %s", role, call_id, turn_number)
         
     except Exception as e:
-        print(f"[Voice DB] Error saving message: {e}")
+        logger.error("[Voice DB] Error saving message: %s", e)
 
 
 def save_voice_call_summary(call_id: str, total_turns: int, full_transcript: str):
     """Save a summary of the voice call to the database."""
     try:
-        import psycopg2
-        database_url = os.environ.get("DATABASE_URL")
-        if not database_url:
+        if not is_database_available():
             return
         
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            INSERT INTO voice_conversations (call_id, total_turns, full_transcript, ended_at)
-            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-            ON CONFLICT (call_id) DO UPDATE SET
-                total_turns = EXCLUDED.total_turns,
-                full_transcript = EXCLUDED.full_transcript,
-                ended_at = CURRENT_TIMESTAMP
-        """, (call_id, total_turns, full_transcript))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_raw_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO voice_conversations (call_id, total_turns, full_transcript, ended_at)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (call_id) DO UPDATE SET
+                    total_turns = EXCLUDED.total_turns,
+                    full_transcript = EXCLUDED.full_transcript,
+                    ended_at = CURRENT_TIMESTAMP
+            """, (call_id, total_turns, full_transcript))
         
-        print(f"[Voice DB] Saved call summary for {call_id}")
+        logger.debug("[Voice DB] Saved call summary for %s", call_id)
         
     except Exception as e:
-        print(f"[Voice DB] Error saving call summary: {e}")
+        logger.error("[Voice DB] Error saving call summary: %s", e)
 
 
 @app.route("/api/vapi/chat/completions", methods=["POST"])
@@ -1957,17 +2457,15 @@ def vapi_custom_llm():
     
     Security: Validates VAPI_WEBHOOK_SECRET if configured.
     """
-    import time as timing_module
-    
     # Helper function to return graceful error response
     def graceful_error_response(stream_mode=False, call_id_val=None):
         """Return a valid OpenAI response with error message - VAPI will speak this."""
         if stream_mode:
             return stream_openai_response(ANNA_ERROR_MESSAGE, call_id_val or "error", end_call=False)
         return jsonify({
-            "id": f"chatcmpl-error-{timing_module.time()}",
+            "id": f"chatcmpl-error-{time.time()}",
             "object": "chat.completion",
-            "created": int(timing_module.time()),
+            "created": int(time.time()),
             "model": "somera-voice-1",
             "choices": [{
                 "index": 0,
@@ -1979,16 +2477,16 @@ def vapi_custom_llm():
     
     # Auth check - still return 401 for security (VAPI will handle this)
     if not validate_vapi_request():
-        print(f"[VAPI Custom LLM] Rejected request - invalid or missing authentication")
-        return jsonify({"error": "Unauthorized"}), 401
+        logger.warning("[VAPI Custom LLM] Rejected request - invalid or missing authentication")
+        return _json_ack(_UNAUTHORIZED_JSON, 401)
     
-    request_start = timing_module.time()
+    request_start = time.time()
     
     # SAFE PARSING: Wrap all request parsing in try-except
     try:
         data = request.get_json(silent=True) or {}
     except Exception as parse_error:
-        print(f"[VAPI Custom LLM] Request parse error: {parse_error}")
+        logger.error("[VAPI Custom LLM] Request parse error: %s", parse_error)
         try:
             log_backend_error("request_parse_error", "/api/vapi/chat/completions", str(parse_error))
         except:
@@ -1996,33 +2494,41 @@ def vapi_custom_llm():
         return graceful_error_response(stream_mode=False)
     
     try:
-        if data:
-            print(f"[VAPI Custom LLM] Raw request keys: {list(data.keys())}")
+        if data and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[VAPI Custom LLM] Raw request keys: %s", list(data.keys()))
         messages = data.get("messages", [])
         stream = data.get("stream", False)
         
         call_metadata = data.get("call", {})
-        call_id = call_metadata.get("id", "custom-llm-" + str(hash(str(messages)))[:8])
+        call_id = call_metadata.get("id")
+        if not call_id:
+            # Only calls without a VAPI id pay for fingerprinting the recent turns
+            recent_turns = tuple((m.get("role"), str(m.get("content", ""))[:32]) for m in messages[-3:])
+            call_id = "custom-llm-" + format(hash(recent_turns) & 0xFFFFFFFF, "08x")
         
-        print(f"[VAPI Custom LLM] Received request for call {call_id}, stream={stream}")
+        logger.debug("[VAPI Custom LLM] Received request for call %s, stream=%s", call_id, stream)
         
-        user_message = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                user_message = msg.get("content", "")
-                break
+        # VAPI appends the latest user turn last; only tool responses push it back
+        if messages and messages[-1].get("role") == "user":
+            user_message = messages[-1].get("content", "")
+        else:
+            user_message = next((msg.get("content", "") for msg in reversed(messages) if msg.get("role") == "user"), "")
         
         if not user_message:
             response_text = "Hello! I'm ANNA, your coaching companion. How are you feeling today?"
             save_voice_message_async(call_id, "assistant", response_text)
+        elif is_end_call_utterance(user_message):
+            # A bare goodbye gets the closing line and endCall without touching the LLM
+            response_text = END_CALL_CLOSING_MESSAGE
+            save_voice_message_async(call_id, "user", user_message)
+            save_voice_message_async(call_id, "assistant", response_text, closure_type="end_call")
+            if stream:
+                return stream_openai_response(response_text, call_id, end_call=True)
         else:
-            history = custom_llm_conversation_histories.get(call_id, [])
+            history = custom_llm_conversation_histories.setdefault(call_id, deque(maxlen=VOICE_HISTORY_MAXLEN))
             
             try:
-                from readiness_scoring import calculate_readiness_score
-                from somera_engine import is_booking_request, get_voice_friendly_booking_response
-                
-                readiness_result = calculate_readiness_score(user_message, history)
+                readiness_result = calculate_readiness_score(user_message, list(history)) if calculate_readiness_score else {}
                 readiness_score = readiness_result.get("total_score", 0)
                 readiness_rec = readiness_result.get("recommendation", "explore")
                 
@@ -2030,7 +2536,7 @@ def vapi_custom_llm():
                 
                 booking = is_booking_request(user_message)
                 
-                print(f"[VAPI Custom LLM] Booking check: {booking}")
+                logger.debug("[VAPI Custom LLM] Booking check: %s", booking)
                 
                 skip_voice_optimization = False
                 closure_type_str = None
@@ -2040,11 +2546,40 @@ def vapi_custom_llm():
                     response_text = get_voice_friendly_booking_response()
                     skip_voice_optimization = True
                     closure_type_str = "booking_request"
-                    print(f"[VAPI Custom LLM] Booking request detected - providing voice-friendly booking info")
+                    logger.info("[VAPI Custom LLM] Booking request detected - providing voice-friendly booking info")
+                elif stream:
+                    streamed_sources = []
+                    
+                    def somera_tokens():
+                        # voice_token_filter usually stops before the final
+                        # "done" chunk, so take sources from whichever chunk
+                        # carries them first (the engine sends them up front)
+                        chunks = generate_somera_response_stream(
+                            user_message,
+                            conversation_history=list(history),
+                            delivery_mode="voice"
+                        )
+                        try:
+                            for chunk in chunks:
+                                if chunk["type"] == "content":
+                                    yield chunk["content"]
+                                elif chunk.get("sources") and not streamed_sources:
+                                    streamed_sources.extend(chunk["sources"])
+                        finally:
+                            chunks.close()
+                    
+                    def record_turn(spoken_text):
+                        elapsed = int((time.time() - request_start) * 1000)
+                        save_voice_message_async(call_id, "assistant", spoken_text, latency_ms=elapsed, sources=streamed_sources)
+                        history.append({"role": "user", "content": user_message})
+                        history.append({"role": "assistant", "content": spoken_text})
+                        logger.debug("[VAPI Custom LLM] Streamed ANNA response in %sms", elapsed)
+                    
+                    return stream_openai_response_iter(voice_token_filter(somera_tokens()), call_id, on_complete=record_turn)
                 else:
                     response_data = generate_somera_response(
                         user_message=user_message,
-                        conversation_history=history,
+                        conversation_history=list(history),
                         delivery_mode="voice"
                     )
                     response_text = response_data.get("response", "I'm here to listen. Could you tell me more?")
@@ -2053,21 +2588,19 @@ def vapi_custom_llm():
                 if not skip_voice_optimization:
                     response_text = optimize_response_for_voice(response_text)
                 
-                elapsed_ms = int((timing_module.time() - request_start) * 1000)
+                elapsed_ms = int((time.time() - request_start) * 1000)
                 
                 save_voice_message_async(call_id, "assistant", response_text, latency_ms=elapsed_ms, closure_type=closure_type_str, sources=sources)
                 
                 history.append({"role": "user", "content": user_message})
                 history.append({"role": "assistant", "content": response_text})
-                custom_llm_conversation_histories[call_id] = history[-20:]
                 
-                print(f"[VAPI Custom LLM] ANNA response: {response_text[:100]}...")
-                print(f"[VAPI Custom LLM] Readiness: {readiness_score:.0%} ({readiness_rec})")
-                print(f"[VAPI Custom LLM] Response latency: {elapsed_ms}ms")
+                logger.debug("[VAPI Custom LLM] ANNA response: %s...", response_text[:100])
+                logger.debug("[VAPI Custom LLM] Readiness: %.0f%% (%s)", readiness_score * 100, readiness_rec)
+                logger.debug("[VAPI Custom LLM] Response latency: %sms", elapsed_ms)
                 
             except Exception as e:
-                print(f"[VAPI Custom LLM] ANNA processing error: {e}")
-                import traceback
+                logger.error("[VAPI Custom LLM] ANNA processing error: %s", e)
                 log_backend_error(
                     error_type="somera_processing_error",
                     endpoint="/api/vapi/chat/completions",
@@ -2080,10 +2613,13 @@ def vapi_custom_llm():
         if stream:
             return stream_openai_response(response_text, call_id, end_call=False)
         else:
+            # Word counts stand in for tokens; VAPI only logs them
+            prompt_tokens = len(user_message.split())
+            completion_tokens = len(response_text.split())
             return jsonify({
                 "id": f"chatcmpl-{call_id}",
                 "object": "chat.completion",
-                "created": int(__import__('time').time()),
+                "created": int(time.time()),
                 "model": "somera-voice-1",
                 "choices": [{
                     "index": 0,
@@ -2094,20 +2630,19 @@ def vapi_custom_llm():
                     "finish_reason": "stop"
                 }],
                 "usage": {
-                    "prompt_tokens": len(user_message.split()),
-                    "completion_tokens": len(response_text.split()),
-                    "total_tokens": len(user_message.split()) + len(response_text.split())
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
                 }
             })
             
     except Exception as e:
         # CRITICAL: Never return 500 - this triggers VAPI fallback to GPT!
         # Instead, return a graceful spoken error message
-        print(f"[VAPI Custom LLM] CRITICAL ERROR - Returning graceful error response: {e}")
+        logger.error("[VAPI Custom LLM] CRITICAL ERROR - Returning graceful error response: %s", e)
         
         # Log error (wrapped in try-except to never interfere with response)
         try:
-            import traceback
             error_details = traceback.format_exc()
             try:
                 raw_data = request.data.decode('utf-8')[:1000] if request.data else None
@@ -2127,6 +2662,55 @@ def vapi_custom_llm():
         return graceful_error_response(stream_mode=False)
 
 
+_SENTENCE_END_RE = re.compile(r'[.?!]\s*$')
+# Unpunctuated runs are cut at a word limit that starts small and doubles per
+# chunk, so audio starts early and later frames stay large
+STREAM_FIRST_CHUNK_WORDS = 5
+STREAM_MAX_CHUNK_WORDS = 80
+
+
+def flush_when(buffer: str, first: bool, word_limit: int = STREAM_MAX_CHUNK_WORDS) -> bool:
+    """
+    Decide whether a buffered piece of speech should be sent to TTS.
+    
+    Flushes at sentence ends, and for the very first piece already at a
+    comma once four words are buffered so audio can start early.
+    """
+    if _SENTENCE_END_RE.search(buffer):
+        return True
+    word_count = len(buffer.split())
+    if first and ',' in buffer and word_count >= 4:
+        return True
+    return word_count >= word_limit
+
+
+def sentence_chunks(text: str):
+    """Split text into prosodic units for streaming, keeping leading spaces."""
+    buffer = ""
+    first = True
+    word_limit = STREAM_FIRST_CHUNK_WORDS
+    for word in text.split():
+        buffer = f"{buffer} {word}" if buffer or not first else word
+        if flush_when(buffer, first, word_limit):
+            yield buffer
+            buffer = ""
+            first = False
+            word_limit = min(word_limit * 2, STREAM_MAX_CHUNK_WORDS)
+    if buffer:
+        yield buffer
+
+
+def _completion_chunk_sse(chunk_id: str, created: int, delta: dict, finish_reason: str = None) -> bytes:
+    """Format one OpenAI chat.completion.chunk as an SSE event."""
+    return _sse({
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": "somera-voice-1",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    })
+
+
 def stream_openai_response(response_text: str, call_id: str, end_call: bool = False):
     """
     Stream response in OpenAI SSE format for real-time voice.
@@ -2142,95 +2726,37 @@ def stream_openai_response(response_text: str, call_id: str, end_call: bool = Fa
         call_id: Unique call identifier
         end_call: If True, include endCall tool call to terminate the VAPI call
     """
-    import time
-    import json
-    
     def generate():
+        created = int(time.time())
         try:
             chunk_id = f"chatcmpl-{call_id}"
             
-            role_chunk = {
-                "id": chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "somera-voice-1",
-                "choices": [{
-                    "index": 0,
-                    "delta": {
-                        "role": "assistant",
-                        "content": ""
-                    },
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(role_chunk)}\n\n"
+            yield _completion_chunk_sse(chunk_id, created, {"role": "assistant", "content": ""})
             
-            words = response_text.split()
-            chunk_size = 3
-            
-            for i in range(0, len(words), chunk_size):
-                chunk_words = words[i:i + chunk_size]
-                chunk_text = " ".join(chunk_words)
-                if i > 0:
-                    chunk_text = " " + chunk_text
-                
-                chunk_data = {
-                    "id": chunk_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": "somera-voice-1",
-                    "choices": [{
-                        "index": 0,
-                        "delta": {
-                            "content": chunk_text
-                        },
-                        "finish_reason": None
-                    }]
-                }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+            for chunk_text in sentence_chunks(response_text):
+                yield _completion_chunk_sse(chunk_id, created, {"content": chunk_text})
             
             if end_call:
-                tool_call_chunk = {
-                    "id": chunk_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": "somera-voice-1",
-                    "choices": [{
-                        "index": 0,
-                        "delta": {
-                            "tool_calls": [{
-                                "id": f"call_endCall_{call_id[:8]}",
-                                "type": "function",
-                                "function": {
-                                    "name": "endCall",
-                                    "arguments": "{}"
-                                }
-                            }]
-                        },
-                        "finish_reason": "tool_calls"
+                end_call_delta = {
+                    "tool_calls": [{
+                        "id": f"call_endCall_{call_id[:8]}",
+                        "type": "function",
+                        "function": {
+                            "name": "endCall",
+                            "arguments": "{}"
+                        }
                     }]
                 }
-                yield f"data: {json.dumps(tool_call_chunk)}\n\n"
-                print(f"[VAPI Custom LLM] Sent endCall tool call to terminate call {call_id}")
+                yield _completion_chunk_sse(chunk_id, created, end_call_delta, "tool_calls")
+                logger.info("[VAPI Custom LLM] Sent endCall tool call to terminate call %s", call_id)
             else:
-                done_data = {
-                    "id": chunk_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": "somera-voice-1",
-                    "choices": [{
-                        "index": 0,
-                        "delta": {},
-                        "finish_reason": "stop"
-                    }]
-                }
-                yield f"data: {json.dumps(done_data)}\n\n"
+                yield _completion_chunk_sse(chunk_id, created, {}, "stop")
             
-            yield "data: [DONE]\n\n"
+            yield _SSE_DONE
             
         except Exception as stream_error:
             # CRITICAL: Catch any streaming errors and return graceful error message
-            print(f"[VAPI Custom LLM] Streaming error - sending graceful error: {stream_error}")
+            logger.error("[VAPI Custom LLM] Streaming error - sending graceful error: %s", stream_error)
             log_backend_error(
                 error_type="streaming_error",
                 endpoint="/api/vapi/chat/completions",
@@ -2239,33 +2765,66 @@ def stream_openai_response(response_text: str, call_id: str, end_call: bool = Fa
             )
             # Send error message as valid SSE chunks
             error_chunk_id = f"chatcmpl-error-{call_id}"
-            error_role = {
-                "id": error_chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "somera-voice-1",
-                "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]
-            }
-            yield f"data: {json.dumps(error_role)}\n\n"
-            
-            error_content = {
-                "id": error_chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "somera-voice-1",
-                "choices": [{"index": 0, "delta": {"content": ANNA_ERROR_MESSAGE}, "finish_reason": None}]
-            }
-            yield f"data: {json.dumps(error_content)}\n\n"
-            
-            error_done = {
-                "id": error_chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "somera-voice-1",
-                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
-            }
-            yield f"data: {json.dumps(error_done)}\n\n"
-            yield "data: [DONE]\n\n"
+            yield _completion_chunk_sse(error_chunk_id, created, {"role": "assistant", "content": ""})
+            yield _completion_chunk_sse(error_chunk_id, created, {"content": ANNA_ERROR_MESSAGE})
+            yield _completion_chunk_sse(error_chunk_id, created, {}, "stop")
+            yield _SSE_DONE
+    
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def stream_openai_response_iter(token_iter, call_id: str, on_complete=None):
+    """
+    Stream text in OpenAI SSE format as it is generated.
+    
+    Unlike stream_openai_response, nothing is buffered: each piece from
+    token_iter is forwarded as its own delta the moment it arrives, so VAPI
+    can start speaking before generation finishes.
+    
+    Args:
+        token_iter: Iterable of text pieces to speak
+        call_id: Unique call identifier
+        on_complete: Optional callback receiving the full spoken text once
+            the stream has finished without error
+    """
+    def generate():
+        chunk_id = f"chatcmpl-{call_id}"
+        created = int(time.time())
+        spoken = []
+        yield _completion_chunk_sse(chunk_id, created, {"role": "assistant", "content": ""})
+        
+        try:
+            for token in token_iter:
+                spoken.append(token)
+                yield _completion_chunk_sse(chunk_id, created, {"content": token})
+                gevent.sleep(0)
+        except Exception as stream_error:
+            # The role chunk is already out, so finish this message with the error text
+            logger.error("[VAPI Custom LLM] Streaming error - sending graceful error: %s", stream_error)
+            log_backend_error(
+                error_type="streaming_error",
+                endpoint="/api/vapi/chat/completions",
+                error_message=str(stream_error),
+                call_id=call_id
+            )
+            yield _completion_chunk_sse(chunk_id, created, {"content": (" " if spoken else "") + ANNA_ERROR_MESSAGE})
+        else:
+            if on_complete:
+                try:
+                    on_complete("".join(spoken))
+                except Exception as callback_error:
+                    logger.error("[VAPI Custom LLM] Failed to record streamed turn: %s", callback_error)
+        
+        yield _completion_chunk_sse(chunk_id, created, {}, "stop")
+        yield _SSE_DONE
     
     return Response(
         generate(),
@@ -2278,7 +2837,193 @@ def stream_openai_response(response_text: str, call_id: str, end_call: bool = Fa
     )
 
 
+# The ANNA Voice dashboard reads mv_voice_daily_stats, so its figures trail
+# live traffic by up to VOICE_STATS_REFRESH_SECONDS
+VOICE_STATS_REFRESH_SECONDS = int(os.environ.get("VOICE_STATS_REFRESH_SECONDS", 300))
+
+
+def _refresh_voice_stats_forever():
+    """Background loop keeping mv_voice_daily_stats current."""
+    while True:
+        gevent.sleep(VOICE_STATS_REFRESH_SECONDS)
+        try:
+            refresh_voice_daily_stats()
+        except Exception as e:
+            logger.warning("[ANNA Admin] Voice stats refresh failed: %s", e)
+
+
+# The rollup itself is created by migrate_voice_analytics.py; until then each
+# refresh fails with a warning and /stats returns 500
+if is_database_available():
+    gevent.spawn(_refresh_voice_stats_forever)
+
+
+# The rollup only refreshes every VOICE_STATS_REFRESH_SECONDS, so polls from
+# several dashboard tabs within the TTL share one query
+SOMERA_STATS_CACHE_TTL_SECONDS = int(os.environ.get("SOMERA_STATS_CACHE_TTL_SECONDS", 30))
+_somera_stats_cache = TTLCache(maxsize=8, ttl=SOMERA_STATS_CACHE_TTL_SECONDS)
+
+
+# Hot ANNA Voice admin queries, PREPAREd once per pooled connection so repeat
+# requests skip parse and plan. Each is prepared on first use, independently,
+# so one failing (say, the rollup is missing) leaves the others working.
+SOMERA_ADMIN_STATEMENTS = {
+    # Totals plus the per-day latency trend in one round-trip, over the same
+    # rolling window as the call list. Days wholly inside the window come from
+    # the rollup; the partial first day, yesterday (which the rollup may not
+    # have caught up on yet) and today are aggregated live.
+    "anna_stats(int)": f"""
+        WITH b AS (
+            SELECT
+                cutoff,
+                cutoff::date + 1 AS full_start,
+                GREATEST(CURRENT_DATE - 1, cutoff::date + 1) AS full_end
+            FROM (SELECT NOW() - make_interval(days => $1) AS cutoff) c
+        ),
+        w AS (
+            SELECT m.* FROM mv_voice_daily_stats m, b
+            WHERE m.d >= b.full_start AND m.d < b.full_end
+            UNION ALL
+            SELECT {VOICE_DAILY_STATS_COLUMNS}
+            FROM voice_messages, b
+            WHERE timestamp >= b.cutoff AND (timestamp < b.full_start OR timestamp >= b.full_end)
+            GROUP BY DATE(timestamp)
+        )
+        SELECT
+            (SELECT COUNT(DISTINCT call_id) FROM w, unnest(w.call_ids) AS call_id) AS calls,
+            COALESCE(SUM(msgs), 0)::bigint AS msgs,
+            COALESCE(SUM(lat_sum)::float8 / NULLIF(SUM(lat_n), 0), 0) AS avg_latency,
+            COALESCE(MAX(peak_r), 0) AS peak_readiness,
+            COALESCE(SUM(r_sum)::float8 / NULLIF(SUM(r_n), 0), 0) AS avg_readiness,
+            COALESCE(SUM(bookings), 0)::bigint AS bookings,
+            COALESCE(SUM(z_explore), 0)::bigint AS z_explore,
+            COALESCE(SUM(z_transition), 0)::bigint AS z_transition,
+            COALESCE(SUM(z_guide), 0)::bigint AS z_guide,
+            (
+                SELECT COALESCE(json_agg(json_build_object(
+                    'date', to_char(d, 'Mon DD'),
+                    'min', COALESCE(min_lat, 0),
+                    'avg', COALESCE(lat_sum::float8 / NULLIF(lat_n, 0), 0),
+                    'max', COALESCE(max_lat, 0)
+                ) ORDER BY d), '[]')
+                FROM w
+            ) AS trend
+        FROM w
+    """,
+    # The list and detail statements return the finished response body as
+    # JSON text, so the handlers pass it straight through.
+    "anna_call_list(int)": """
+        SELECT jsonb_build_object('calls', COALESCE(jsonb_agg(jsonb_build_object(
+            'callId', call_id,
+            'startedAt', to_jsonb(started_at),
+            'endedAt', to_jsonb(ended_at),
+            'messageCount', message_count,
+            'avgLatency', NULLIF(avg_latency, 0),
+            'peakReadiness', COALESCE(peak_readiness, 0),
+            'hadBooking', had_booking
+        ) ORDER BY started_at DESC), '[]'::jsonb))::text
+        FROM (
+            SELECT 
+                call_id,
+                MIN(timestamp) as started_at,
+                MAX(timestamp) as ended_at,
+                COUNT(*) as message_count,
+                AVG(latency_ms) FILTER (WHERE latency_ms > 0) as avg_latency,
+                MAX(readiness_score) as peak_readiness,
+                COUNT(*) FILTER (WHERE closure_type = 'booking_request') > 0 as had_booking
+            FROM voice_messages
+            WHERE timestamp >= NOW() - make_interval(days => $1)
+            GROUP BY call_id
+            ORDER BY MIN(timestamp) DESC
+            LIMIT 50
+        ) c
+    """,
+    "anna_call_detail(text)": """
+        SELECT jsonb_build_object('callId', $1::text, 'messages', COALESCE(jsonb_agg(jsonb_build_object(
+            'role', role,
+            'content', content,
+            'readinessScore', NULLIF(readiness_score, 0),
+            'readinessRecommendation', readiness_recommendation,
+            'latencyMs', NULLIF(latency_ms, 0),
+            'closureType', closure_type,
+            'timestamp', to_jsonb(timestamp),
+            'sources', sources
+        ) ORDER BY timestamp ASC), '[]'::jsonb))::text
+        FROM voice_messages
+        WHERE call_id = $1
+    """,
+}
+
+
+# Admin payloads are repetitive JSON and CSV; level 1 gets most of the size
+# win for very little CPU. Tiny bodies are not worth the gzip header.
+ADMIN_GZIP_LEVEL = 1
+ADMIN_GZIP_MIN_BYTES = 1024
+ADMIN_GZIP_MIMETYPES = ("application/json", "text/csv")
+
+
+def gzip_admin_response(view):
+    """Gzip a view's response when the client accepts it, streamed or not."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = app.make_response(view(*args, **kwargs))
+        if (response.status_code != 200
+                or response.mimetype not in ADMIN_GZIP_MIMETYPES
+                or "Content-Encoding" in response.headers):
+            return response
+        # Set on both variants, so a shared cache never serves gzip to a client that refused it
+        response.vary.add("Accept-Encoding")
+        if request.accept_encodings["gzip"] <= 0:
+            return response
+        
+        if response.is_streamed:
+            chunks = response.response
+            compressor = zlib.compressobj(ADMIN_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            
+            def compressed():
+                for chunk in chunks:
+                    data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+                    if data:
+                        yield data
+                yield compressor.flush()
+            
+            response.response = compressed()
+        else:
+            body = response.get_data()
+            if len(body) < ADMIN_GZIP_MIN_BYTES:
+                return response
+            response.set_data(gzip.compress(body, compresslevel=ADMIN_GZIP_LEVEL))
+        
+        response.headers["Content-Encoding"] = "gzip"
+        return response
+    return wrapper
+
+
+# numeric -> float for admin cursors, so Decimal never reaches jsonify. Registered
+# per cursor: SQLAlchemy shares these pooled connections and expects Decimal.
+DEC2FLOAT = new_type(DECIMAL.values, "DEC2FLOAT", lambda value, cur: float(value) if value is not None else None)
+
+
+def _prepare_somera_admin_statement(conn, signature: str):
+    """PREPARE one admin statement on this connection unless already done.
+    
+    PREPARE is not undone by a rollback, so a statement left behind by an
+    attempt that failed before it was recorded is replaced, not re-prepared.
+    """
+    prepared = conn.info.setdefault("somera_admin_prepared", set())
+    if signature in prepared:
+        return
+    name = signature.partition("(")[0]
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+        if cur.fetchone():
+            cur.execute(f"DEALLOCATE {name}")
+        cur.execute(f"PREPARE {signature} AS {SOMERA_ADMIN_STATEMENTS[signature]}")
+    prepared.add(signature)
+
+
 @app.route("/api/admin/somera/stats", methods=["GET"])
+@gzip_admin_response
 def somera_admin_stats():
     """Get ANNA Voice statistics for admin dashboard."""
     try:
@@ -2289,96 +3034,48 @@ def somera_admin_stats():
         elif range_param == '24h':
             days = 1
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                COUNT(DISTINCT call_id) as total_calls,
-                COUNT(*) as total_messages,
-                AVG(CASE WHEN latency_ms > 0 THEN latency_ms END) as avg_latency,
-                MAX(readiness_score) as peak_readiness,
-                AVG(readiness_score) as avg_readiness,
-                COUNT(CASE WHEN closure_type = 'booking_request' THEN 1 END) as booking_requests
-            FROM voice_messages
-            WHERE timestamp >= NOW() - INTERVAL '%s days'
-        """, (days,))
-        row = cur.fetchone()
-        
-        total_calls = row[0] or 0
-        total_messages = row[1] or 0
-        avg_latency = float(row[2]) if row[2] else 0
-        peak_readiness = float(row[3]) if row[3] else 0
-        avg_readiness = float(row[4]) if row[4] else 0
-        booking_requests = row[5] or 0
-        
-        booking_rate = (booking_requests / total_calls * 100) if total_calls > 0 else 0
-        
-        cur.execute("""
-            SELECT 
-                DATE(timestamp) as date,
-                MIN(CASE WHEN latency_ms > 0 THEN latency_ms END) as min_latency,
-                AVG(CASE WHEN latency_ms > 0 THEN latency_ms END) as avg_latency,
-                MAX(CASE WHEN latency_ms > 0 THEN latency_ms END) as max_latency
-            FROM voice_messages
-            WHERE timestamp >= NOW() - INTERVAL '%s days'
-            GROUP BY DATE(timestamp)
-            ORDER BY date
-        """, (days,))
-        latency_rows = cur.fetchall()
-        
-        latency_trends = []
-        for lr in latency_rows:
-            latency_trends.append({
-                "date": lr[0].strftime('%b %d') if lr[0] else '',
-                "min": float(lr[1]) if lr[1] else 0,
-                "avg": float(lr[2]) if lr[2] else 0,
-                "max": float(lr[3]) if lr[3] else 0
-            })
-        
-        cur.execute("""
-            SELECT 
-                CASE 
-                    WHEN readiness_score < 0.20 THEN 'explore'
-                    WHEN readiness_score < 0.35 THEN 'transition'
-                    ELSE 'guide'
-                END as zone,
-                COUNT(*) as count
-            FROM voice_messages
-            WHERE role = 'user' AND readiness_score IS NOT NULL
-                AND timestamp >= NOW() - INTERVAL '%s days'
-            GROUP BY zone
-        """, (days,))
-        zone_rows = cur.fetchall()
+        cached = _somera_stats_cache.get(days)
+        if cached is not None:
+            return jsonify(cached)
         
-        readiness_distribution = {"explore": 0, "transition": 0, "guide": 0}
-        for zr in zone_rows:
-            if zr[0] in readiness_distribution:
-                readiness_distribution[zr[0]] = zr[1]
+        with get_raw_connection() as conn:
+            if conn is None:
+                return jsonify({"error": "Database connection failed"}), 500
+            
+            _prepare_somera_admin_statement(conn, "anna_stats(int)")
+            cur = conn.cursor(cursor_factory=NamedTupleCursor)
+            register_type(DEC2FLOAT, cur)
+            
+            cur.execute("EXECUTE anna_stats(%s)", (days,))
+            row = cur.fetchone()
         
-        cur.close()
-        conn.close()
+        booking_rate = (row.bookings / row.calls * 100) if row.calls > 0 else 0
         
-        return jsonify({
-            "totalCalls": total_calls,
-            "totalMessages": total_messages,
-            "avgLatency": round(avg_latency, 1),
-            "peakReadiness": round(peak_readiness * 100, 1),
-            "avgReadiness": round(avg_readiness * 100, 1),
+        payload = {
+            "totalCalls": row.calls,
+            "totalMessages": row.msgs,
+            "avgLatency": round(row.avg_latency, 1),
+            "peakReadiness": round(row.peak_readiness * 100, 1),
+            "avgReadiness": round(row.avg_readiness * 100, 1),
             "bookingRate": round(booking_rate, 1),
-            "latencyTrends": latency_trends,
-            "readinessDistribution": readiness_distribution
-        })
+            "latencyTrends": row.trend,
+            "readinessDistribution": {
+                "explore": row.z_explore,
+                "transition": row.z_transition,
+                "guide": row.z_guide
+            }
+        }
+        _somera_stats_cache[days] = payload
+        
+        return jsonify(payload)
         
     except Exception as e:
-        print(f"[ANNA Admin] Stats error: {e}")
+        logger.error("[ANNA Admin] Stats error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/admin/somera/calls", methods=["GET"])
+@gzip_admin_response
 def somera_admin_calls():
     """Get list of ANNA Voice calls for admin dashboard."""
     try:
@@ -2389,124 +3086,138 @@ def somera_admin_calls():
         elif range_param == '24h':
             days = 1
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                call_id,
-                MIN(timestamp) as started_at,
-                MAX(timestamp) as ended_at,
-                COUNT(*) as message_count,
-                AVG(CASE WHEN latency_ms > 0 THEN latency_ms END) as avg_latency,
-                MAX(readiness_score) as peak_readiness,
-                BOOL_OR(closure_type = 'booking_request') as had_booking
-            FROM voice_messages
-            WHERE timestamp >= NOW() - INTERVAL '%s days'
-            GROUP BY call_id
-            ORDER BY MIN(timestamp) DESC
-            LIMIT 50
-        """, (days,))
-        rows = cur.fetchall()
-        
-        calls = []
-        for row in rows:
-            calls.append({
-                "callId": row[0],
-                "startedAt": row[1].isoformat() if row[1] else None,
-                "endedAt": row[2].isoformat() if row[2] else None,
-                "messageCount": row[3] or 0,
-                "avgLatency": float(row[4]) if row[4] else None,
-                "peakReadiness": float(row[5]) if row[5] else 0,
-                "hadBooking": row[6] or False
-            })
-        
-        cur.close()
-        conn.close()
+        with get_raw_connection() as conn:
+            if conn is None:
+                return jsonify({"error": "Database connection failed"}), 500
+            
+            _prepare_somera_admin_statement(conn, "anna_call_list(int)")
+            cur = conn.cursor()
+            
+            cur.execute("EXECUTE anna_call_list(%s)", (days,))
+            body = cur.fetchone()[0]
         
-        return jsonify({"calls": calls})
+        return _json_ack(body)
         
     except Exception as e:
-        print(f"[ANNA Admin] Calls error: {e}")
+        logger.error("[ANNA Admin] Calls error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/admin/somera/calls/<call_id>", methods=["GET"])
+@gzip_admin_response
 def somera_admin_call_detail(call_id):
     """Get detailed transcript for a specific ANNA Voice call."""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                role, content, readiness_score, readiness_recommendation,
-                latency_ms, closure_type, timestamp, sources
-            FROM voice_messages
-            WHERE call_id = %s
-            ORDER BY timestamp ASC
-        """, (call_id,))
-        rows = cur.fetchall()
-        
-        import json
-        messages = []
-        for row in rows:
-            sources_data = None
-            if row[7]:
-                try:
-                    sources_data = json.loads(row[7]) if isinstance(row[7], str) else row[7]
-                except:
-                    sources_data = None
+        with get_raw_connection() as conn:
+            if conn is None:
+                return jsonify({"error": "Database connection failed"}), 500
             
-            messages.append({
-                "role": row[0],
-                "content": row[1],
-                "readinessScore": float(row[2]) if row[2] else None,
-                "readinessRecommendation": row[3],
-                "latencyMs": float(row[4]) if row[4] else None,
-                "closureType": row[5],
-                "timestamp": row[6].isoformat() if row[6] else None,
-                "sources": sources_data
-            })
-        
-        cur.close()
-        conn.close()
+            _prepare_somera_admin_statement(conn, "anna_call_detail(text)")
+            cur = conn.cursor()
+            
+            cur.execute("EXECUTE anna_call_detail(%s)", (call_id,))
+            body = cur.fetchone()[0]
         
-        return jsonify({
-            "callId": call_id,
-            "messages": messages
-        })
+        return _json_ack(body)
         
     except Exception as e:
-        print(f"[ANNA Admin] Call detail error: {e}")
+        logger.error("[ANNA Admin] Call detail error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
-def get_db_connection():
-    """Get PostgreSQL database connection."""
-    import psycopg2
+SOMERA_EXPORT_BATCH_ROWS = 500
+SOMERA_PARQUET_BATCH_ROWS = 10000
+
+if pa is not None:
+    SOMERA_PARQUET_SCHEMA = pa.schema([
+        ("call_id", pa.string()),
+        ("call_started", pa.timestamp("us", tz="UTC")),
+        ("call_ended", pa.timestamp("us", tz="UTC")),
+        ("role", pa.string()),
+        ("message", pa.string()),
+        ("readiness_score", pa.float64()),
+        ("readiness_recommendation", pa.string()),
+        ("latency_ms", pa.float64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+class _ParquetStreamSink:
+    """Write-only file for ParquetWriter whose bytes are handed out as they arrive.
+    
+    tell() keeps counting across drains, since the footer records row group
+    offsets from the start of the file.
+    """
+    
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def somera_export_parquet(days: int):
+    """Stream the same rows as the CSV, typed and zstd-compressed as Parquet.
+    
+    Each batch from the cursor becomes one row group and is sent as soon as
+    it is written; the footer follows the last one.
+    """
+    sink = _ParquetStreamSink()
     try:
-        conn = psycopg2.connect(os.environ.get("DATABASE_URL"))
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
+        with get_raw_connection() as conn, pq.ParquetWriter(sink, SOMERA_PARQUET_SCHEMA, compression="zstd") as writer:
+            cur = conn.cursor(name="somera_export_parquet")
+            cur.execute("""
+                SELECT 
+                    vc.call_id, vc.started_at, vc.ended_at,
+                    vm.role, vm.content, vm.readiness_score::float8,
+                    vm.readiness_recommendation, vm.latency_ms::float8, vm.timestamp
+                FROM voice_conversations vc
+                LEFT JOIN voice_messages vm ON vc.call_id = vm.call_id
+                WHERE vc.started_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+                ORDER BY vc.started_at DESC, vm.timestamp ASC
+            """, (days,))
+            
+            while True:
+                rows = cur.fetchmany(SOMERA_PARQUET_BATCH_ROWS)
+                if not rows:
+                    break
+                columns = zip(*rows)
+                writer.write_batch(pa.record_batch(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, SOMERA_PARQUET_SCHEMA)],
+                    schema=SOMERA_PARQUET_SCHEMA,
+                ))
+                yield sink.drain()
+        yield sink.drain()  # the footer, written on close
+    except Exception as stream_error:
+        # Headers are already sent; the footer is withheld so a cut-short file
+        # fails to open instead of reading as a complete export
+        logger.error("[ANNA Admin] Parquet export stream error: %s", stream_error)
 
 
 @app.route("/api/admin/somera/export", methods=["GET"])
+@gzip_admin_response
 def somera_admin_export_csv():
-    """Export ANNA Voice calls and transcripts as CSV."""
+    """Export ANNA Voice calls and transcripts as CSV, or Parquet with ?format=parquet."""
     try:
-        import csv
-        import io
-        from datetime import datetime, timedelta
-        
         range_param = request.args.get("range", "30d")
         days = 30
         if range_param == "24h":
@@ -2516,59 +3227,76 @@ def somera_admin_export_csv():
         elif range_param == "30d":
             days = 30
         
-        conn = get_db_connection()
-        if not conn:
+        if not is_database_available():
             return jsonify({"error": "Database connection failed"}), 500
         
-        cur = conn.cursor()
+        if request.args.get("format") == "parquet":
+            if pq is None:
+                return jsonify({"error": "Parquet export is not available"}), 501
+            return Response(
+                somera_export_parquet(days),
+                mimetype='application/vnd.apache.parquet',
+                headers={
+                    'Content-Disposition': f'attachment; filename=somera_transcripts_{datetime.now().strftime("%Y%m%d")}.parquet'
+                }
+            )
         
-        cur.execute("""
-            SELECT 
-                vc.call_id,
-                vc.started_at,
-                vc.ended_at,
-                vm.role,
-                vm.content,
-                vm.readiness_score,
-                vm.readiness_recommendation,
-                vm.latency_ms,
-                vm.timestamp
-            FROM voice_conversations vc
-            LEFT JOIN voice_messages vm ON vc.call_id = vm.call_id
-            WHERE vc.started_at >= CURRENT_TIMESTAMP - INTERVAL '%s days'
-            ORDER BY vc.started_at DESC, vm.timestamp ASC
-        """, (days,))
-        rows = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'Call ID', 'Call Started', 'Call Ended', 
-            'Role', 'Message', 'Readiness Score', 
-            'Readiness Zone', 'Latency (ms)', 'Timestamp'
-        ])
-        
-        for row in rows:
+        def generate():
+            # Rows are formatted and sent a batch at a time instead of building
+            # the whole file in memory first
+            output = io.StringIO()
+            writer = csv.writer(output)
             writer.writerow([
-                row[0],
-                row[1].strftime('%Y-%m-%d %H:%M:%S') if row[1] else '',
-                row[2].strftime('%Y-%m-%d %H:%M:%S') if row[2] else '',
-                row[3] or '',
-                row[4] or '',
-                f"{float(row[5]) * 100:.1f}%" if row[5] else '',
-                row[6] or '',
-                int(row[7]) if row[7] else '',
-                row[8].strftime('%Y-%m-%d %H:%M:%S') if row[8] else ''
+                'Call ID', 'Call Started', 'Call Ended', 
+                'Role', 'Message', 'Readiness Score', 
+                'Readiness Zone', 'Latency (ms)', 'Timestamp'
             ])
+            
+            try:
+                with get_raw_connection() as conn:
+                    # Named (server-side) cursor: each fetchmany pulls one batch
+                    # from Postgres rather than libpq buffering the whole join
+                    cur = conn.cursor(name="somera_export")
+                    
+                    # Columns come back already formatted for the CSV
+                    cur.execute("""
+                        SELECT 
+                            vc.call_id,
+                            COALESCE(to_char(vc.started_at, 'YYYY-MM-DD HH24:MI:SS'), ''),
+                            COALESCE(to_char(vc.ended_at, 'YYYY-MM-DD HH24:MI:SS'), ''),
+                            COALESCE(vm.role, ''),
+                            COALESCE(vm.content, ''),
+                            CASE WHEN vm.readiness_score <> 0
+                                THEN to_char(vm.readiness_score * 100, 'FM990.0') || '%%'
+                                ELSE '' END,
+                            COALESCE(vm.readiness_recommendation, ''),
+                            CASE WHEN vm.latency_ms <> 0 THEN trunc(vm.latency_ms)::bigint::text ELSE '' END,
+                            COALESCE(to_char(vm.timestamp, 'YYYY-MM-DD HH24:MI:SS'), '')
+                        FROM voice_conversations vc
+                        LEFT JOIN voice_messages vm ON vc.call_id = vm.call_id
+                        WHERE vc.started_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+                        ORDER BY vc.started_at DESC, vm.timestamp ASC
+                    """, (days,))
+                    
+                    while True:
+                        rows = cur.fetchmany(SOMERA_EXPORT_BATCH_ROWS)
+                        if not rows:
+                            break
+                        
+                        writer.writerows(rows)
+                        yield output.getvalue()
+                        output.seek(0)
+                        output.truncate(0)
+            except Exception as stream_error:
+                # Headers are already sent; re-raising makes the server abort the
+                # chunked response, so the download fails instead of looking complete
+                logger.error("[ANNA Admin] Export stream error: %s", stream_error)
+                raise
+            
+            yield output.getvalue()
         
-        output.seek(0)
-        
-        from flask import Response
         return Response(
-            output.getvalue(),
+            generate(),
             mimetype='text/csv',
             headers={
                 'Content-Disposition': f'attachment; filename=somera_transcripts_{datetime.now().strftime("%Y%m%d")}.csv'
@@ -2576,10 +3304,11 @@ def somera_admin_export_csv():
         )
         
     except Exception as e:
-        print(f"[ANNA Admin] Export error: {e}")
+        logger.error("[ANNA Admin] Export error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 if __name__ == "__main__":
+    from gevent.pywsgi import WSGIServer
     port = int(os.environ.get("WEBHOOK_PORT", 8080))
-    app.run(host="0.0.0.0", port=port, debug=False)
+    WSGIServer(("0.0.0.0", port), app).serve_forever()